@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Helpers shared by the benchmarks. They must be launched from the root
+    of the repository, e.g. python benchmarks/dns_index.py. The analysis
+    directory is put first in sys.path, like when its scripts are run, so
+    the classes and utils modules (and the config.yaml) are found.
+"""
+
+import random
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYSIS = os.path.join(ROOT, "tinycheckweb", "analysis")
+CAPTURES = os.path.join(ROOT, "tinycheckweb", "medias", "captures")
+
+sys.path.insert(0, ANALYSIS)
+sys.path.append(ROOT)
+
+DNS_FIELDS = ["ts", "uid", "id.orig_h", "id.orig_p", "id.resp_h", "id.resp_p", "proto", "trans_id",
+              "rtt", "query", "qclass", "qclass_name", "qtype", "qtype_name", "rcode", "rcode_name",
+              "AA", "TC", "RD", "RA", "Z", "answers", "TTLs", "rejected"]
+DNS_TYPES = ["time", "string", "addr", "port", "addr", "port", "enum", "count",
+             "interval", "string", "count", "string", "count", "string", "count", "string",
+             "bool", "bool", "bool", "bool", "count", "vector[string]", "vector[interval]", "bool"]
+CONN_FIELDS = ["ts", "uid", "id.orig_h", "id.orig_p", "id.resp_h", "id.resp_p", "proto", "service",
+               "duration", "orig_bytes", "resp_bytes", "conn_state", "local_orig", "local_resp",
+               "missed_bytes", "history", "orig_pkts", "orig_ip_bytes", "resp_pkts", "resp_ip_bytes",
+               "tunnel_parents"]
+CONN_TYPES = ["time", "string", "addr", "port", "addr", "port", "enum", "string",
+              "interval", "count", "count", "string", "bool", "bool",
+              "count", "string", "count", "count", "count", "count",
+              "set[string]"]
+
+
+def write_log(path, fields, types, rows):
+    """
+        Write a Zeek TSV log, with the header of the ASCII writer.
+        :return: nothing.
+    """
+    with open(path, "w") as f:
+        f.write("#separator \\x09\n#set_separator\t,\n#empty_field\t(empty)\n#unset_field\t-\n")
+        f.write("#path\t{}\n#open\t2021-01-01-00-00-00\n".format(os.path.basename(path)[:-len(".log")]))
+        f.write("#fields\t" + "\t".join(fields) + "\n#types\t" + "\t".join(types) + "\n")
+        for row in rows:
+            f.write("\t".join(str(v) for v in row) + "\n")
+        f.write("#close\t2021-01-01-00-00-01\n")
+
+
+def dns_rows(count):
+    """
+        Synthetic dns.log rows, the n-th query answering a CNAME and 10.x.y.z.
+        :return: generator of rows.
+    """
+    for i in range(count):
+        ip = "10.{}.{}.{}".format(i // 65536, (i // 256) % 256, i % 256)
+        yield [1.0 + i, "C", "192.168.1.2", 5353, "8.8.8.8", 53, "udp", i, 0.01,
+               "host{}.example.com".format(i), 1, "C_INTERNET", 1, "A", 0, "NOERROR",
+               "F", "F", "T", "T", 0, "cname{}.example.com,{}".format(i, ip), "60,60", "F"]
+
+
+def conn_rows(count, seed=0):
+    """
+        Synthetic conn.log rows, with some unset values.
+        :return: generator of rows.
+    """
+    rand = random.Random(seed)
+    for i in range(count):
+        yield [1.0 + i, "Cabc", "192.168.1.2", rand.randint(1000, 60000),
+               "10.0.{}.{}".format(rand.randint(0, 255), rand.randint(0, 255)),
+               rand.choice([443, 80, 53, 5228]), rand.choice(["tcp", "udp"]),
+               rand.choice(["ssl", "http", "-", "dns"]), rand.choice(["0.5", "-"]),
+               rand.choice(["10", "-"]), 20, "SF", "T", "F", 0, "ShADadFf", 5, 300, 4, 200, "(empty)"]
+
+
+def timed(func, *args, **kwargs):
+    """
+        Call a function once.
+        :return: (result, seconds)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
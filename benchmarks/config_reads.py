@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Cost of a configuration read: the cached get_config and typed accessor
+    against parsing config.yaml on every call, as get_config used to.
+
+        python benchmarks/config_reads.py [--calls 2000]
+"""
+
+from common import timed
+from functools import reduce
+import argparse
+import timeit
+import yaml
+import os
+import utils
+
+KEY = ("analysis", "max_alerts")
+
+
+def parse_config(path):
+    """
+        Read a value like the previous get_config, parsing the file.
+        :return: value.
+    """
+    with open(os.path.join(utils.parent, "config.yaml"), "r") as f:
+        return reduce(dict.get, path, yaml.load(f, Loader=yaml.SafeLoader))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    value, first = timed(utils.get_config, KEY)
+    assert value == parse_config(KEY)
+    calls = max(args.calls // 10, 1)
+    parse = timeit.timeit(lambda: parse_config(KEY), number=calls) / calls
+    cached = timeit.timeit(lambda: utils.get_config(KEY), number=args.calls) / args.calls
+    typed = timeit.timeit(lambda: utils.get_config_int(KEY), number=args.calls) / args.calls
+
+    print("config.yaml read per call")
+    print("  parsed every call  {:8.1f} us".format(parse * 1e6))
+    print("  first get_config   {:8.1f} us".format(first * 1e6))
+    print("  cached get_config  {:8.2f} us".format(cached * 1e6))
+    print("  get_config_int     {:8.2f} us".format(typed * 1e6))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Resolution of the conn addresses: reverse-DNS index of the ZeekEngine
+    against the previous scan of every dns.log record for each address.
+
+        python benchmarks/dns_index.py [--queries 50000] [--lookups 2000]
+"""
+
+from common import write_log, dns_rows, timed, DNS_FIELDS, DNS_TYPES
+from classes.parsezeeklogs import ParseZeekLogs
+from classes.zeekengine import read_dns
+import argparse
+import tempfile
+import os
+
+
+def scan_records(filepath):
+    """
+        Read the dns.log records like the previous fill_dns did.
+        :return: list of {"domain", "answers"}.
+    """
+    return [{"domain": r["query"], "answers": r["answers"].split(",")}
+            for r in ParseZeekLogs(filepath, output_format="json", safe_headers=False)
+            if r is not None and r["qtype_name"] in ["A", "AAAA"]]
+
+
+def scan_resolve(records, ip):
+    """
+        Resolve an address by scanning the records.
+        :return: str - first domain answering it, or the address.
+    """
+    for record in records:
+        if ip in record["answers"]:
+            return record["domain"]
+    return ip
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "dns.log")
+        write_log(path, DNS_FIELDS, DNS_TYPES, dns_rows(args.queries))
+        ips = ["10.{}.{}.{}".format(n // 65536, (n // 256) % 256, n % 256)
+               for n in ((i * 7919) % args.queries for i in range(args.lookups))]
+
+        records = scan_records(path)
+        dns_index, index_time = timed(read_dns, path)
+        scanned, scan_time = timed(lambda: [scan_resolve(records, ip) for ip in ips])
+        indexed, lookup_time = timed(lambda: [dns_index.get(ip, ip) for ip in ips])
+        assert scanned == indexed, "the index doesn't resolve like the scan"
+
+    print("{} lookups over {} queries".format(args.lookups, args.queries))
+    print("  scan of the records  {:.3f}s".format(scan_time))
+    print("  index lookups        {:.4f}s (index built in {:.3f}s)".format(lookup_time, index_time))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Import of a synthetic IOC feed with the FeedImporter, for some batch
+    sizes, then again once every row is stored, against adding the rows
+    through the ORM with a single commit. Each run works on a fresh copy
+    of the shipped tinycheck.sqlite3.
+
+        python benchmarks/feed_import.py [--iocs 100000] [--batch-sizes 500,5000,50000]
+"""
+
+from common import timed, ROOT
+from tinycheckweb import create_app, db
+from tinycheckweb.feeds.importer import FeedImporter
+from tinycheckweb.models import IOC
+import argparse
+import tempfile
+import shutil
+import random
+import json
+import io
+import os
+
+DATABASE = os.path.join(ROOT, "tinycheckweb", "tinycheck.sqlite3")
+
+
+def make_feed(count, duplicates, seed=0):
+    """
+        Build a feed of IOCs, some of them repeated.
+        :return: str - JSON document.
+    """
+    rand = random.Random(seed)
+    iocs = [{"type": "domain", "value": "d{}.example.com".format(i), "tag": "stalkerware", "tlp": "white"}
+            if i % 2 else
+            {"type": "ip4addr", "value": "10.{}.{}.{}".format(i // 65536, (i // 256) % 256, i % 256),
+             "tag": "stalkerware", "tlp": "white"}
+            for i in range(count - duplicates)]
+    iocs += rand.sample(iocs, duplicates)
+    return json.dumps({"iocs": iocs})
+
+
+def database_copy(directory):
+    """
+        Get an app working on a fresh copy of the shipped database.
+        :return: Flask app.
+    """
+    path = os.path.join(directory, "tinycheck.sqlite3")
+    for ext in ("", "-wal", "-shm"):
+        if os.path.exists(path + ext):
+            os.remove(path + ext)
+    shutil.copy(DATABASE, path)
+    app = create_app()
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    return app
+
+
+def orm_import(feed):
+    """
+        Add every IOC of the feed through the ORM, without deduplication.
+        :return: int - number of added IOCs.
+    """
+    iocs = json.loads(feed)["iocs"]
+    db.session.add_all([IOC(type=i["type"], value=i["value"], tag=i["tag"], tlp=i["tlp"],
+                            source="watcher", added_on=0) for i in iocs])
+    db.session.commit()
+    return len(iocs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iocs", type=int, default=100000)
+    parser.add_argument("--duplicates", type=int, default=500)
+    parser.add_argument("--batch-sizes", default="500,{},50000".format(FeedImporter.BATCH_SIZE))
+    args = parser.parse_args()
+
+    feed = make_feed(args.iocs, args.duplicates)
+    print("{} IOCs, {} duplicates".format(args.iocs, args.duplicates))
+    with tempfile.TemporaryDirectory() as d:
+        for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+            app = database_copy(d)
+            with app.app_context():
+                importer = FeedImporter(batch_size)
+                inserted, t = timed(importer.import_iocs, io.StringIO(feed))
+                print("  importer, batches of {:<6} {:6.2f}s  {} inserted, {} skipped".format(
+                    batch_size, t, inserted, importer.skipped))
+
+                importer = FeedImporter()
+                inserted, t = timed(importer.import_iocs, io.StringIO(feed))
+                print("  re-import                   {:6.2f}s  {} inserted, {} skipped".format(
+                    t, inserted, importer.skipped))
+                db.engine.dispose()
+
+        app = database_copy(d)
+        with app.app_context():
+            added, t = timed(orm_import, feed)
+            print("  ORM add_all, one commit     {:6.2f}s  {} added".format(t, added))
+            db.session.remove()
+            db.engine.dispose()
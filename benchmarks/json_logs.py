@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Both Zeek ingestion paths on the same capture: zeek is run twice on
+    the pcap, with the TSV and with the JSON writer. The records read from
+    each pair of logs and the outputs of the ZeekEngine checks must be
+    identical, and the logs are read --repeat times to time the readers.
+    The active checks are left out, they don't depend on the log format.
+
+        python benchmarks/json_logs.py [--pcap capture.pcap] [--repeat 200]
+"""
+
+from common import timed, CAPTURES
+from classes.zeeklogreader import open_zeek_log, ZeekLogReader, ZeekJsonLogReader
+from classes.zeekengine import ZeekEngine, DNS_FIELDS, SSL_FIELDS, FILES_FIELDS
+from classes.conncolumns import ConnColumns
+from utils import render_alert
+import subprocess as sp
+import argparse
+import tempfile
+import json
+import os
+from run import return_app
+
+LOGS = {"conn.log": ConnColumns.FIELDS, "dns.log": DNS_FIELDS,
+        "ssl.log": SSL_FIELDS, "files.log": FILES_FIELDS}
+
+
+def run_zeek(zeek, pcap, directory, json_logs):
+    """
+        Run zeek on the capture like ZeekEngine.run_zeek, in a directory.
+        :return: nothing.
+    """
+    sp.run([zeek, "-Cr", os.path.abspath(pcap), "protocols/ssl/validate-certs"] +
+           (["LogAscii::use_json=T"] if json_logs else []), cwd=directory, check=True)
+
+
+def run_checks(directory):
+    """
+        Run the checks of the ZeekEngine on the logs of a directory.
+        :return: (alerts, conns, whitelist)
+    """
+    engine = ZeekEngine(directory)
+    engine.active_analysis = False
+    engine.parse_logs(directory)
+    engine.netflow_check()
+    engine.ssl_check()
+    engine.files_check()
+    engine.alerts_check()
+    key = lambda x: json.dumps(x, sort_keys=True)
+    return (sorted((render_alert(a) for a in engine.retrieve_alerts()), key=key),
+            engine.retrieve_conns(), sorted(engine.retrieve_whitelist(), key=key))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pcap", default=os.path.join(CAPTURES, sorted(os.listdir(CAPTURES))[0]))
+    parser.add_argument("--zeek", default="/opt/zeek/bin/zeek")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tsv, tempfile.TemporaryDirectory() as js:
+        run_zeek(args.zeek, args.pcap, tsv, False)
+        run_zeek(args.zeek, args.pcap, js, True)
+
+        print("{}, logs read {} times".format(os.path.basename(args.pcap), args.repeat))
+        for log, fields in LOGS.items():
+            tsv_log, json_log = os.path.join(tsv, log), os.path.join(js, log)
+            if not os.path.isfile(tsv_log) or not os.path.isfile(json_log):
+                print("  {:10} not written".format(log))
+                continue
+            assert isinstance(open_zeek_log(tsv_log), ZeekLogReader)
+            assert isinstance(open_zeek_log(json_log), ZeekJsonLogReader)
+
+            records = []
+            for path in (tsv_log, json_log):
+                read, t = timed(lambda: [list(open_zeek_log(path, fields=fields)) for _ in range(args.repeat)])
+                records.append((read[0], t))
+            (tsv_records, tsv_time), (json_records, json_time) = records
+            assert tsv_records == json_records, "{}: the records differ".format(log)
+
+            rows = len(tsv_records) * args.repeat
+            print("  {:10} {:6} rows  TSV {:8.0f} rows/s  JSON {:8.0f} rows/s".format(
+                log, len(tsv_records), rows / tsv_time if tsv_time else 0, rows / json_time if json_time else 0))
+
+        app = return_app()
+        with app.app_context():
+            same = run_checks(tsv) == run_checks(js)
+        print("  engine outputs (alerts, conns, whitelist): {}".format("identical" if same else "DIFFERENT"))
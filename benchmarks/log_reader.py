@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Throughput of the Zeek TSV readers on a conn.log: ParseZeekLogs
+    against ZeekLogReader reading every column, the columns used by the
+    checks, and the same columns as namedtuples.
+
+        python benchmarks/log_reader.py [--rows 200000] [--log conn.log]
+"""
+
+from common import write_log, conn_rows, timed, CONN_FIELDS, CONN_TYPES
+from classes.parsezeeklogs import ParseZeekLogs
+from classes.zeeklogreader import ZeekLogReader
+import argparse
+import tempfile
+import os
+
+FIELDS = ["id.resp_h", "proto", "id.resp_p", "service"]
+
+
+def run(path):
+    parsed, parse_time = timed(lambda: [dict(r) for r in ParseZeekLogs(path, output_format="json", safe_headers=False)
+                                        if r is not None])
+    full, full_time = timed(lambda: list(ZeekLogReader(path)))
+    assert parsed == full, "ZeekLogReader doesn't read like ParseZeekLogs"
+    projected, projected_time = timed(lambda: list(ZeekLogReader(path, fields=FIELDS)))
+    assert projected == [{k: r[k] for k in FIELDS if k in r} for r in full]
+    _, tuple_time = timed(lambda: list(ZeekLogReader(path, fields=FIELDS, output_format="namedtuple")))
+
+    rows = len(full)
+    print("{} rows".format(rows))
+    print("  ParseZeekLogs          {:8.0f} rows/s".format(rows / parse_time))
+    for name, t in (("all columns", full_time), ("projected", projected_time), ("projected namedtuple", tuple_time)):
+        print("  {:22} {:8.0f} rows/s  x{:.1f}".format(name, rows / t, parse_time / t))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--log", help="conn.log to read instead of a synthetic one")
+    args = parser.parse_args()
+
+    if args.log:
+        run(args.log)
+    else:
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "conn.log")
+            write_log(path, CONN_FIELDS, CONN_TYPES, conn_rows(args.rows))
+            run(path)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Cost of ZeekEngine.parse_logs, serial against the pool of spawned
+    processes, on log sets of growing size (the dns, ssl and files logs
+    being a fraction of the conn.log, as in the captures). Used to set
+    zeek_parse_min_size.
+
+    The pool can't be faster than its fixed cost (spawning the processes,
+    which import the analysis modules) plus the parsing of the slowest log
+    and the transfer of its result: that estimate is printed next to the
+    measured times, as the measure itself depends on the number of cores.
+
+        python benchmarks/parse_logs.py [--rows 1000 10000 100000 400000] [--workers 4]
+"""
+
+from common import write_log, conn_rows, dns_rows, timed, CONN_FIELDS, CONN_TYPES, DNS_FIELDS, DNS_TYPES
+from classes import zeekengine
+from classes.zeekengine import ZeekEngine
+import argparse
+import tempfile
+import pickle
+import random
+import os
+
+SSL_FIELDS = ["ts", "uid", "id.orig_h", "id.orig_p", "id.resp_h", "id.resp_p", "version", "server_name",
+              "issuer", "validation_status"]
+SSL_TYPES = ["time", "string", "addr", "port", "addr", "port", "string", "string", "string", "string"]
+FILES_FIELDS = ["ts", "fuid", "tx_hosts", "rx_hosts", "conn_uids", "source", "mime_type", "filename", "sha1"]
+FILES_TYPES = ["time", "string", "set[addr]", "set[addr]", "set[string]", "string", "string", "string", "string"]
+
+
+def write_logs(directory, rows):
+    rand = random.Random(rows)
+    write_log(os.path.join(directory, "conn.log"), CONN_FIELDS, CONN_TYPES, conn_rows(rows))
+    write_log(os.path.join(directory, "dns.log"), DNS_FIELDS, DNS_TYPES, dns_rows(rows // 4))
+    write_log(os.path.join(directory, "ssl.log"), SSL_FIELDS, SSL_TYPES,
+              ([1.0 + i, "C", "192.168.1.2", 1, "10.0.{}.{}".format(rand.randint(0, 255), rand.randint(0, 255)),
+                443, "TLSv12", "host{}.example.com".format(i), "CN=R3,O=Let's Encrypt,C=US", "ok"]
+               for i in range(rows // 10)))
+    write_log(os.path.join(directory, "files.log"), FILES_FIELDS, FILES_TYPES,
+              ([1.0 + i, "F", "10.0.0.1", "192.168.1.2", "C", "SSL", "application/x-x509-ca-cert", "-",
+                "{:040x}".format(i)] for i in range(rows // 20)))
+
+
+def parse(directory, workers, min_size=0):
+    config = {("analysis", "zeek_parse_workers"): workers, ("analysis", "zeek_parse_min_size"): min_size}
+    zeekengine.get_config_int = lambda path, default=None: config.get(path, default)
+    os.cpu_count = lambda: workers
+    engine = ZeekEngine.__new__(ZeekEngine)
+    engine.parse_logs(directory)
+    return engine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 400000])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print("{:>8} {:>9} {:>9} {:>9} {:>9} {:>10}".format("conns", "logs MB", "serial s", "pool s",
+                                                       "slowest s", "estimate s"))
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as d:
+            write_logs(d, rows)
+            size = sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d))
+            engine, serial = timed(parse, d, 1)
+            _, pool = timed(parse, d, args.workers)
+
+            # Slowest log of the pool: its parsing and the transfer of its result.
+            slowest = 0
+            for reader, log in ((zeekengine.read_dns, "dns.log"), (zeekengine.read_conns, "conn.log"),
+                                (zeekengine.read_ssl, "ssl.log"), (zeekengine.read_files, "files.log")):
+                result, parse_time = timed(reader, os.path.join(d, log))
+                _, transfer = timed(lambda: pickle.loads(pickle.dumps(result)))
+                slowest = max(slowest, parse_time + transfer)
+            with tempfile.TemporaryDirectory() as empty:
+                _, startup = timed(parse, empty, args.workers)
+            print("{:8} {:9.1f} {:9.3f} {:9.3f} {:9.3f} {:10.3f}".format(
+                rows, size / 1e6, serial, pool, slowest, startup + slowest))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+    Check and time the sharded Zeek runs. The capture is split with the
+    PcapSharder and every packet of the shards is mapped back to its flow,
+    IP fragments and IPv6 extension headers included: each flow must be
+    in a single shard. Then, unless --no-zeek, zeek runs on the whole
+    capture and on the shards, and the merged conn.log must hold the same
+    connections as the unsharded one.
+
+    Without --pcap, a synthetic capture with TCP and UDP flows, IPv4 and
+    IPv6 fragments and IPv6 extension headers is used.
+
+        python benchmarks/zeek_shards.py [--pcap capture.pcap] [--shards 16]
+"""
+
+from common import timed
+from classes.pcapsharder import PcapSharder
+from classes.zeeklogreader import open_zeek_log, merge_zeek_logs
+import subprocess as sp
+import argparse
+import tempfile
+import socket
+import struct
+import os
+
+IPV6_EXTENSIONS = (0, 43, 60)
+
+
+def ethernet(ether_type, payload):
+    return b"\x02\x00\x00\x00\x00\x01\x02\x00\x00\x00\x00\x02" + ether_type + payload
+
+
+def ipv4(src, dst, proto, payload, ident=0, offset=0, more=False):
+    flags = (offset // 8) | (0x2000 if more else 0)
+    return struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), ident, flags, 64, proto, 0,
+                       socket.inet_aton(src), socket.inet_aton(dst)) + payload
+
+
+def ipv6(src, dst, next_header, payload):
+    return struct.pack(">IHBB16s16s", 6 << 28, len(payload), next_header, 64,
+                       socket.inet_pton(socket.AF_INET6, src), socket.inet_pton(socket.AF_INET6, dst)) + payload
+
+
+def transport(proto, sport, dport, data=b""):
+    if proto == 6:
+        return struct.pack(">HHIIBBHHH", sport, dport, 1, 1, 0x50, 0x18, 65535, 0, 0) + data
+    return struct.pack(">HHHH", sport, dport, 8 + len(data), 0) + data
+
+
+def synthetic_packets():
+    """
+        Build the packets of the synthetic capture.
+        :return: list of (timestamp, frame).
+    """
+    frames, client, client6 = [], "192.168.1.2", "fd00::2"
+    for n in range(200):
+        server, port = "10.{}.{}.{}".format(n % 7, n % 5, 1 + n % 11), 1024 + n
+        frames.append(ethernet(b"\x08\x00", ipv4(client, server, 6, transport(6, port, 443, b"x" * 100))))
+        frames.append(ethernet(b"\x08\x00", ipv4(server, client, 6, transport(6, 443, port, b"y" * 100))))
+
+        # A UDP datagram in three IPv4 fragments, then an unfragmented one.
+        datagram = transport(17, port, 5000 + n % 3, b"z" * 2992)
+        for offset in range(0, len(datagram), 1000):
+            frames.append(ethernet(b"\x08\x00", ipv4(client, server, 17, datagram[offset:offset + 1000], ident=n,
+                                                      offset=offset, more=offset + 1000 < len(datagram))))
+        frames.append(ethernet(b"\x08\x00", ipv4(server, client, 17, transport(17, 5000 + n % 3, port, b"ok"))))
+
+        # IPv6 TCP, some packets with a hop-by-hop header.
+        server6 = "2001:db8::{:x}".format(1 + n % 13)
+        segment = transport(6, port, 443, b"x" * 100)
+        frames.append(ethernet(b"\x86\xdd", ipv6(client6, server6, 6, segment)))
+        frames.append(ethernet(b"\x86\xdd", ipv6(client6, server6, 0, bytes([6, 0]) + b"\x01\x04" + b"\x00" * 4 + segment)))
+
+        # An IPv6 UDP datagram in two fragments, then an unfragmented one.
+        datagram = transport(17, port, 5353, b"w" * 1992)
+        for offset in (0, 1000):
+            header = struct.pack(">BBHI", 17, 0, offset | (1 if offset == 0 else 0), n)
+            frames.append(ethernet(b"\x86\xdd", ipv6(client6, server6, 44, header + datagram[offset:offset + 1000])))
+        frames.append(ethernet(b"\x86\xdd", ipv6(server6, client6, 17, transport(17, 5353, port, b"ok"))))
+    return [(1600000000 + i / 100, frame) for i, frame in enumerate(frames)]
+
+
+def write_pcap(path, packets):
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for ts, frame in packets:
+            f.write(struct.pack("<IIII", int(ts), int(ts % 1 * 1e6), len(frame), len(frame)) + frame)
+
+
+def read_frames(path):
+    """
+        Read the Ethernet frames of a pcap or pcapng capture.
+        :return: generator of bytes.
+    """
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        f.seek(0)
+        if magic in PcapSharder.PCAP_MAGICS:
+            endian = PcapSharder.PCAP_MAGICS[f.read(24)[:4]]
+            while True:
+                record = f.read(16)
+                if len(record) < 16:
+                    return
+                yield f.read(struct.unpack_from(endian + "I", record, 8)[0])
+        else:
+            endian = "<"
+            while True:
+                header = f.read(12)
+                if len(header) < 12:
+                    return
+                if header[:4] == PcapSharder.PCAPNG_MAGIC:
+                    endian = PcapSharder.PCAPNG_BYTE_ORDER[header[8:12]]
+                block_type, length = struct.unpack_from(endian + "II", header)
+                block = header + f.read(length - 12)
+                if block_type == 6:
+                    yield block[28:28 + struct.unpack_from(endian + "I", block, 20)[0]]
+
+
+class FlowMapper(object):
+    """
+        Map packets to their flow, the fragments getting the ports of the
+        first fragment of their datagram.
+    """
+
+    def __init__(self):
+        self.fragments = {}
+
+    def flow(self, frame):
+        """
+            Get the flow of an Ethernet frame.
+            :return: tuple or None for the non-IP frames.
+        """
+        ether_type, offset = frame[12:14], 14
+        if ether_type == b"\x08\x00":
+            proto, src, dst = frame[offset + 9], frame[offset + 12:offset + 16], frame[offset + 16:offset + 20]
+            fragment = struct.unpack_from(">H", frame, offset + 6)[0]
+            ident = (src, dst, proto, struct.unpack_from(">H", frame, offset + 4)[0])
+            more, frag_offset = fragment & 0x2000, fragment & 0x1fff
+            offset += (frame[offset] & 0x0f) * 4
+        elif ether_type == b"\x86\xdd":
+            proto, src, dst = frame[offset + 6], frame[offset + 8:offset + 24], frame[offset + 24:offset + 40]
+            offset += 40
+            ident, more, frag_offset = None, 0, 0
+            while proto in IPV6_EXTENSIONS or proto == 44:
+                if proto == 44:
+                    fragment, frag_id = struct.unpack_from(">HI", frame, offset + 2)
+                    ident, more, frag_offset = (src, dst, frame[offset], frag_id), fragment & 1, fragment >> 3
+                    proto, offset = frame[offset], offset + 8
+                else:
+                    proto, offset = frame[offset], offset + (frame[offset + 1] + 1) * 8
+        else:
+            return None
+
+        if frag_offset:
+            ports = self.fragments.get(ident)
+        else:
+            ports = struct.unpack_from(">HH", frame, offset) if proto in (6, 17) else (0, 0)
+            if more:
+                self.fragments[ident] = ports
+        if ports is None:
+            raise ValueError("fragment without its first fragment")
+        return (proto,) + tuple(sorted(((src, ports[0]), (dst, ports[1]))))
+
+
+def check_flows(directories):
+    """
+        Check that every flow is in a single shard.
+        :return: (packets, flows)
+    """
+    shards, packets = {}, 0
+    for shard, directory in enumerate(directories):
+        mapper = FlowMapper()
+        for frame in read_frames(os.path.join(directory, "capture.pcap")):
+            packets += 1
+            flow = mapper.flow(frame)
+            if flow is not None:
+                shards.setdefault(flow, set()).add(shard)
+    split = [flow for flow, s in shards.items() if len(s) > 1]
+    assert not split, "{} flows split across shards".format(len(split))
+    return packets, len(shards)
+
+
+def connections(path):
+    """
+        Read the connections of a conn.log, without their uid.
+        :return: sorted list of tuples.
+    """
+    return sorted(tuple(sorted((k, str(v)) for k, v in r.items() if k != "uid"))
+                  for r in open_zeek_log(path) if r is not None)
+
+
+def run_zeek(zeek, directories):
+    processes = [sp.Popen([zeek, "-Cr", "capture.pcap"], cwd=d) for d in directories]
+    for process in processes:
+        process.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pcap")
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--zeek", default="/opt/zeek/bin/zeek")
+    parser.add_argument("--no-zeek", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        whole = os.path.join(d, "whole")
+        os.makedirs(whole)
+        pcap = os.path.join(whole, "capture.pcap")
+        if args.pcap:
+            with open(args.pcap, "rb") as src, open(pcap, "wb") as dst:
+                dst.write(src.read())
+        else:
+            write_pcap(pcap, synthetic_packets())
+
+        directories, split_time = timed(PcapSharder(pcap).split, os.path.join(d, "shards"), args.shards)
+        packets, flows = check_flows(directories)
+        assert packets == sum(1 for _ in read_frames(pcap)), "packets lost by the split"
+        print("{} packets, {} flows, {} shards: each flow in one shard (split in {:.2f}s)".format(
+            packets, flows, args.shards, split_time))
+
+        if not args.no_zeek:
+            _, whole_time = timed(run_zeek, args.zeek, [whole])
+            _, shards_time = timed(run_zeek, args.zeek, directories)
+            merged = os.path.join(d, "conn.log")
+            merge_zeek_logs([os.path.join(s, "conn.log") for s in directories
+                             if os.path.isfile(os.path.join(s, "conn.log"))], merged)
+            expected, got = connections(os.path.join(whole, "conn.log")), connections(merged)
+            print("zeek: {:.2f}s unsharded, {:.2f}s on the shards".format(whole_time, shards_time))
+            print("conn.log: {} connections unsharded, {} sharded: {}".format(
+                len(expected), len(got), "identical" if expected == got else "DIFFERENT"))
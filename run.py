@@ -1,4 +1,10 @@
+import os
+import sys
+import atexit
+import signal
+import subprocess
 from tinycheckweb import create_app
+from tinycheckweb.models import upgrade_db
 
 app = create_app()
 
@@ -6,5 +12,29 @@ def return_app():
     """Return the new instance of app created """
     return app
 
+def start_workers():
+    """
+        Start the analysis worker pool (tinycheckweb/analysis/worker.py)
+        next to the development server and stop it with the server. The
+        analyses are only queued by the app, they are run by this pool.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    pool = subprocess.Popen([sys.executable, os.path.join("tinycheckweb", "analysis", "worker.py")], cwd=root)
+
+    def stop_workers():
+        pool.terminate()
+        pool.wait()
+
+    atexit.register(stop_workers)
+    return pool
+
 if __name__=='__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # With the reloader, the server runs in a child process restarted on
+    # each change: the pool is started once, by the watching process.
+    if os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        with app.app_context():
+            upgrade_db()
+        start_workers()
+        # Exit normally on SIGTERM, so the pool is stopped too.
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    app.run(debug=True)
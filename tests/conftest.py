@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The analysis modules are imported like analysis.py does, from its
+# directory, with the root of the application on the path too.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tinycheckweb", "analysis"))
+
+# utils takes the directory of the application from sys.path[0].
+import utils  # noqa: E402,F401
@@ -0,0 +1,46 @@
+from tinycheckweb.capture.cache import ResultCache
+import pytest
+import time
+import os
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    (tmp_path / "config.yaml").write_text("analysis:\n  active: true\n  active_cache_ttl: 3600\n")
+    capture = tmp_path / "capture"
+    (capture / "assets").mkdir(parents=True)
+    for name in ResultCache.FILES:
+        (capture / name).write_text("{}")
+    cache = ResultCache(str(tmp_path), max_entries=3)
+    monkeypatch.setattr(cache, "fingerprint", lambda: "current")
+    cache.capture = str(capture)
+    return cache
+
+
+def age(path, seconds):
+    os.utime(path, (time.time() - seconds, time.time() - seconds))
+
+
+def test_put_prunes_expired_and_foreign_entries(cache):
+    cache.put("expired", cache.capture)
+    age(os.path.join(cache.directory, "expired"), 7200)
+    cache.put("foreign", cache.capture)
+    with open(os.path.join(cache.directory, "foreign", "fingerprint"), "w") as f:
+        f.write("old iocs")
+    os.makedirs(os.path.join(cache.directory, "legacy"))
+    os.makedirs(os.path.join(cache.directory, ".interrupted"))
+    age(os.path.join(cache.directory, ".interrupted"), 2 * ResultCache.TMP_MAX_AGE)
+    os.makedirs(os.path.join(cache.directory, ".writing"))
+
+    cache.put("new", cache.capture)
+
+    assert sorted(os.listdir(cache.directory)) == [".writing", "new"]
+    assert cache.get("new", cache.capture)
+
+
+def test_put_keeps_the_newest_entries(cache):
+    for n in range(5):
+        cache.put(str(n), cache.capture)
+        age(os.path.join(cache.directory, str(n)), 10 * (5 - n))
+
+    assert sorted(os.listdir(cache.directory)) == ["2", "3", "4"]
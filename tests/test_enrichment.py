@@ -0,0 +1,61 @@
+from classes import enrichment
+from classes.enrichment import ActiveEnrichment
+from datetime import datetime
+import subprocess as sp
+
+WHOIS_OUTPUT = """   Domain Name: EXAMPLE.COM
+   Registry Domain ID: 2336799_DOMAIN_COM-VRSN
+   Registrar WHOIS Server: whois.iana.org
+   Updated Date: 2023-08-14T07:01:38Z
+   Creation Date: 1995-08-14T04:00:00Z
+   Registry Expiry Date: 2024-08-13T04:00:00Z
+   Registrar: RESERVED-Internet Assigned Numbers Authority
+   Domain Status: clientDeleteProhibited
+   Name Server: A.IANA-SERVERS.NET
+   Name Server: B.IANA-SERVERS.NET
+   DNSSEC: signedDelegation
+"""
+
+NO_MATCH_OUTPUT = """No match for "EXAMPLE.COM".
+>>> Last update of whois database: 2024-01-01T00:00:00Z <<<
+
+NOTICE: The expiration date displayed in this record is the date the
+registrar's sponsorship of the domain name registration in the registry is
+currently set to expire.
+"""
+
+
+class Cache(object):
+
+    def get(self, kind, domain):
+        return False, None
+
+    def set(self, kind, domain, value):
+        pass
+
+    def commit(self):
+        pass
+
+
+def fake_whois(output):
+    def run(args, **kwargs):
+        assert args == ["whois", "example.com"]
+        return sp.CompletedProcess(args, 0, stdout=output)
+    return run
+
+
+def test_lookup_whois_returns_the_creation_date(monkeypatch):
+    monkeypatch.setattr(enrichment.sp, "run", fake_whois(WHOIS_OUTPUT))
+    active = ActiveEnrichment(cache=Cache(), resolver=object())
+
+    creation_date = datetime.fromisoformat(active.lookup_whois("example.com"))
+
+    assert creation_date.year == 1995
+    assert active.run("whois", "example.com")[2] is True
+
+
+def test_lookup_whois_of_an_unknown_domain(monkeypatch):
+    monkeypatch.setattr(enrichment.sp, "run", fake_whois(NO_MATCH_OUTPUT))
+    active = ActiveEnrichment(cache=Cache(), resolver=object())
+
+    assert active.run("whois", "example.com") == ("whois", "example.com", True, None)
@@ -0,0 +1,15 @@
+from classes.evereader import EveReader
+import os
+
+EVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "eve.json")
+
+
+def test_only_alerts_are_read():
+    alerts = [(e["dest_ip"], e["alert"]["signature"], e["alert"]["signature_id"]) for e in EveReader(EVE)]
+
+    assert alerts == [("10.0.0.1", "STALKERWARE Bad domain", 1000001),
+                      ("10.0.0.3", "SPYWARE C2 beacon", 1000002)]
+
+
+def test_other_event_types():
+    assert [e["flow_id"] for e in EveReader(EVE, event_types=("dns", "flow"))] == [1, 2]
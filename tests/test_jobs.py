@@ -0,0 +1,56 @@
+from run import app
+from tinycheckweb import db
+from tinycheckweb.models import Job, Worker
+from tinycheckweb.capture.analysis import Analysis
+import pytest
+import time
+
+
+@pytest.fixture
+def database(tmp_path):
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///{}".format(tmp_path / "tinycheck.sqlite3")
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.engine.dispose()
+
+
+def add_job(state, age, heartbeat=None):
+    now = int(time.time())
+    job = Job(token="token", state=state, capture_id=1, user_id=1, created_on=now - age,
+              started_on=now - age if state == "running" else None, heartbeat=heartbeat)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def test_queued_jobs_wait_for_a_live_pool(database):
+    job = add_job("queued", 2 * app.config["ANALYSIS_QUEUE_TIMEOUT"])
+    db.session.add(Worker(id="worker", heartbeat=int(time.time())))
+    db.session.commit()
+
+    assert Analysis.fail_stale_jobs() == 0
+    assert job.state == "queued"
+
+
+def test_queued_jobs_fail_without_pool(database):
+    old = add_job("queued", 2 * app.config["ANALYSIS_QUEUE_TIMEOUT"])
+    recent = add_job("queued", 10)
+    db.session.add(Worker(id="worker", heartbeat=int(time.time()) - 2 * app.config["ANALYSIS_WORKER_TIMEOUT"]))
+    db.session.commit()
+
+    assert Analysis.fail_stale_jobs() == 1
+    db.session.expire_all()
+    assert (old.state, recent.state) == ("failed", "queued")
+
+
+def test_running_jobs_fail_when_their_worker_stops(database):
+    now = int(time.time())
+    timeout = app.config["ANALYSIS_WORKER_TIMEOUT"]
+    alive = add_job("running", 10 * timeout, heartbeat=now)
+    dead = add_job("running", 10 * timeout, heartbeat=now - 2 * timeout)
+
+    assert Analysis.fail_stale_jobs() == 1
+    db.session.expire_all()
+    assert (alive.state, dead.state) == ("running", "failed")
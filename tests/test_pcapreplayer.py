@@ -0,0 +1,28 @@
+from tinycheckweb.capture.pcap import link_or_copy
+from classes.pcapreplayer import PcapReplayer
+import struct
+import os
+
+
+def write_pcap(path, frames):
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for n, frame in enumerate(frames):
+            f.write(struct.pack("<IIII", 1600000000 + n, 0, len(frame), len(frame)) + frame)
+
+
+def test_replay_into_a_linked_capture_keeps_the_upload(tmp_path):
+    upload, replayed = str(tmp_path / "upload.pcap"), str(tmp_path / "replayed.pcap")
+    write_pcap(upload, [b"\x00" * 60])
+    write_pcap(replayed, [b"\x01" * 60, b"\x02" * 60])
+    with open(upload, "rb") as f:
+        original = f.read()
+    capture = str(tmp_path / "capture.pcap")
+    link_or_copy(upload, capture)
+
+    assert PcapReplayer(replayed, capture, rate=1000).run() == 2
+    with open(upload, "rb") as f:
+        assert f.read() == original
+    with open(replayed, "rb") as f, open(capture, "rb") as g:
+        assert f.read() == g.read()
+    assert not os.path.samefile(upload, capture)
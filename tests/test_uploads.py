@@ -0,0 +1,56 @@
+from run import app
+from tinycheckweb import db
+from tinycheckweb.models import User, Capture
+from tinycheckweb.capture import routes
+from flask_jwt_extended import create_access_token
+import hashlib
+import struct
+import pytest
+import os
+
+PCAP = struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1) + \
+    b"".join(struct.pack("<IIII", 1600000000 + n, 0, 60, 60) + bytes([n]) * 60 for n in range(4))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///{}".format(tmp_path / "tinycheck.sqlite3")
+    monkeypatch.setattr(app, "root_path", str(tmp_path))
+    monkeypatch.setattr(routes, "inspectors", {})
+    os.makedirs(str(tmp_path / "medias" / "captures"))
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email="user@tinycheck", password="password"))
+        db.session.commit()
+        token = create_access_token(identity="user@tinycheck")
+        client = app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = "Bearer " + token
+        yield client
+        db.session.remove()
+        db.engine.dispose()
+
+
+def put(client, capture_id, data, start, end):
+    return client.put("/api/capture/uploads/{}".format(capture_id), data=data,
+                      headers={"Content-Range": "bytes {}-{}/{}".format(start, end, len(PCAP))})
+
+
+def test_chunks_shorter_or_longer_than_their_range(client):
+    capture_id = client.post("/api/capture/uploads").get_json()["id"]
+    path = os.path.join(app.root_path, "medias", "captures", Capture.query.filter_by(id=capture_id).first().path)
+
+    # Truncated chunk: rejected, nothing is kept.
+    response = put(client, capture_id, PCAP[:50], 0, 99)
+    assert (response.status_code, response.get_json()["offset"]) == (400, 0)
+    assert os.path.getsize(path) == 0
+
+    # Chunk longer than its range: only the range is written.
+    response = put(client, capture_id, PCAP[:120], 0, 99)
+    assert (response.status_code, response.get_json()["offset"]) == (200, 100)
+
+    response = put(client, capture_id, PCAP[100:], 100, len(PCAP) - 1)
+    assert response.get_json()["complete"]
+    capture = Capture.query.filter_by(id=capture_id).first()
+    assert (capture.packets, capture.sha1) == (4, hashlib.sha1(PCAP).hexdigest())
+    with open(path, "rb") as f:
+        assert f.read() == PCAP
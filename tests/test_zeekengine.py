@@ -0,0 +1,39 @@
+from classes import zeekengine
+from classes.alertstore import AlertStore
+from classes.zeekengine import ZeekEngine, read_files
+
+FILES_LOG = """#separator \\x09
+#set_separator\t,
+#empty_field\t(empty)
+#unset_field\t-
+#path\tfiles
+#fields\tts\tfuid\ttx_hosts\trx_hosts\tconn_uids\tsource\tmime_type\tfilename\tsha1
+#types\ttime\tstring\tset[addr]\tset[addr]\tset[string]\tstring\tstring\tstring\tstring
+1.0\tF1\t10.0.0.1\t192.168.1.2\tC1\tSSL\tapplication/x-x509-ca-cert\t-\tbadcert
+2.0\tF2\t10.0.0.1\t192.168.1.2\tC2\tSSL\tapplication/x-x509-ca-cert\t-\tbadcert
+3.0\tF3\t10.0.0.2\t192.168.1.2\tC3\tSSL\tapplication/x-x509-ca-cert\t-\tgoodcert
+4.0\tF4\t10.0.0.3\t192.168.1.2\tC4\tHTTP\ttext/html\t-\tbadcert
+#close\t2021-01-01-00-00-01
+"""
+
+
+def engine(files):
+    engine = ZeekEngine.__new__(ZeekEngine)
+    engine.iocs_analysis = True
+    engine.alerts = AlertStore()
+    engine.dns_index = {}
+    engine.files = files
+    return engine
+
+
+def test_blacklisted_certificate(tmp_path, monkeypatch):
+    log = tmp_path / "files.log"
+    log.write_text(FILES_LOG)
+    monkeypatch.setattr(zeekengine, "get_iocs", lambda ioc_type: [["badcert", "stalkerware"]])
+
+    zeek = engine(read_files(str(log)))
+    zeek.files_check()
+
+    alerts = list(zeek.retrieve_alerts())
+    assert [(a.id, a.level, a.host, a.title_args, a.description_args) for a in alerts] == \
+        [("IOC-07", "High", "192.168.1.2", ("STALKERWARE", "192.168.1.2"), ("badcert", "192.168.1.2"))]
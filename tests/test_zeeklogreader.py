@@ -0,0 +1,42 @@
+from classes.zeeklogreader import merge_zeek_logs, open_zeek_log
+
+HEADER = "#separator \\x09\n#path\t{}\n#fields\t{}\n#types\t{}\n"
+
+
+def write_log(path, fields, types, rows, close="#close\t2021-01-01-00-00-01\n"):
+    with open(str(path), "w") as f:
+        f.write(HEADER.format(path.stem, "\t".join(fields), "\t".join(types)))
+        f.writelines("\t".join(row) + "\n" for row in rows)
+        f.write(close)
+    return str(path)
+
+
+def test_merge_sorts_the_records_by_timestamp(tmp_path):
+    fields, types = ["ts", "uid"], ["time", "string"]
+    logs = [write_log(tmp_path / "a.log", fields, types, [["1.0", "A1"], ["4.0", "A4"]]),
+            write_log(tmp_path / "b.log", fields, types, [["2.0", "B2"], ["3.0", "B3"], ["5.0", "B5"]],
+                      close="#close\tlast\n")]
+    merge_zeek_logs(logs, str(tmp_path / "conn.log"))
+
+    assert [r["uid"] for r in open_zeek_log(str(tmp_path / "conn.log"))] == ["A1", "B2", "B3", "A4", "B5"]
+    with open(str(tmp_path / "conn.log")) as f:
+        lines = f.readlines()
+    assert lines[:4] == HEADER.format("a", "ts\tuid", "time\tstring").splitlines(True)
+    assert lines[-1] == "#close\tlast\n"
+
+
+def test_merge_concatenates_the_logs_without_timestamp(tmp_path):
+    fields, types = ["fingerprint", "name"], ["string", "string"]
+    logs = [write_log(tmp_path / "a.log", fields, types, [["f1", "a"]]),
+            write_log(tmp_path / "b.log", fields, types, [["f2", "b"], ["f3", "c"]])]
+    merge_zeek_logs(logs, str(tmp_path / "x509.log"))
+
+    assert [r["name"] for r in open_zeek_log(str(tmp_path / "x509.log"))] == ["a", "b", "c"]
+
+
+def test_merge_json_logs(tmp_path):
+    (tmp_path / "a.log").write_text('{"ts":1.0,"uid":"A1"}\n{"ts":3.0,"uid":"A3"}\n')
+    (tmp_path / "b.log").write_text('{"ts":2.0,"uid":"B2"}\n')
+    merge_zeek_logs([str(tmp_path / "a.log"), str(tmp_path / "b.log")], str(tmp_path / "conn.log"))
+
+    assert [r["uid"] for r in open_zeek_log(str(tmp_path / "conn.log"))] == ["A1", "B2", "A3"]
@@ -25,4 +25,15 @@ def create_app(config_class=Config):
     app.register_blueprint(users, url_prefix="/api/auth")
     app.register_blueprint(capture, url_prefix="/api/capture")
 
+    from tinycheckweb.feeds.commands import feeds
+
+    app.cli.add_command(feeds)
+
+    from tinycheckweb.models import upgrade_db
+
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Upgrade the database to the current schema."""
+        upgrade_db()
+
     return app
\ No newline at end of file
@@ -4,7 +4,10 @@
 from classes.zeekengine import ZeekEngine
 from classes.suricataengine import SuricataEngine
 from classes.report import Report
-from multiprocessing import Process, Manager
+from classes.alertstore import AlertStore
+from utils import render_alert
+from threading import Thread
+from flask import current_app
 import sys
 import re
 import json
@@ -12,72 +15,107 @@ import os
 sys.path.append(os.path.abspath('./'))
 from run import return_app
 
+
+def write_json(path, data):
+    """
+        Write a JSON file through a temporary one, so a reader never gets
+        a partial file when it is rewritten by the live analysis.
+        :return: nothing.
+    """
+    tmp = "{}.tmp".format(path)
+    with open(tmp, "w") as f:
+        f.write(json.dumps(data, indent=4, separators=(',', ': ')))
+    os.replace(tmp, path)
+
+
+def write_alerts(capture_directory, stores):
+    """
+        Render the alerts of some stores and write them, by level, in alerts.json.
+        :return: nothing.
+    """
+    report = {level.lower(): [render_alert(alert) for store in stores
+                              for alert in store.level(level)]
+              for level in AlertStore.LEVELS}
+    write_json(os.path.join(capture_directory, "assets/alerts.json"), report)
+
+
+def write_report(capture_directory, capture_sha1=None):
+    """
+        Generate the report from the assets and write it in report.json.
+        :return: nothing.
+    """
+    report = Report(capture_directory, capture_sha1)
+    report =  report.generate_report()
+
+    #write the result in a json file
+    tmp = os.path.join(capture_directory, "report.json.tmp")
+    with open(tmp, "w") as r:
+        r.write(report)
+    os.replace(tmp, os.path.join(capture_directory, "report.json"))
+
+
+def analyse(capture_directory, ioc_index=None, whitelist_matcher=None, capture_sha1=None):
+    """
+        Run the Zeek and Suricata engines against the capture of a directory
+        and write the alerts, conns, whitelist and report files.
+        The SHA1 of the capture is computed if it isn't provided.
+        Must be called within the app context.
+
+        :return: nothing.
+    """
+    alerts = {}
+    app = current_app._get_current_object()
+
+    def zeekengine(alerts):
+        with app.app_context():
+            zeek = ZeekEngine(capture_directory, ioc_index, whitelist_matcher)
+            zeek.start_zeek()
+            alerts["zeek"] = zeek.retrieve_alerts()
+
+            # whitelist.json and conns.json writing.
+            write_json(os.path.join(capture_directory, "assets/whitelist.json"),
+                       zeek.retrieve_whitelist())
+            write_json(os.path.join(capture_directory, "assets/conns.json"),
+                       zeek.retrieve_conns())
+
+    def snortengine(alerts):
+        with app.app_context():
+            suricata = SuricataEngine(capture_directory)
+            suricata.start_suricata()
+            alerts["suricata"] = suricata.get_alerts()
+
+    # Start the engines. Both mostly wait on their external
+    # process, so threads are enough to run them side by side.
+    t1 = Thread(target=zeekengine, args=(alerts,))
+    t2 = Thread(target=snortengine, args=(alerts,))
+    t1.start()
+    t2.start()
+
+    # Wait to their end.
+    t1.join()
+    t2.join()
+
+    # Some formating and alerts.json writing, the stores keep the alerts by level.
+    write_alerts(capture_directory, (alerts["zeek"], alerts["suricata"]))
+
+    # Generate the report
+    write_report(capture_directory, capture_sha1)
+
+
 """
-    Like this file is not a part of a flask application, we must get the app_context and execute this 
+    Like this file is not a part of a flask application, we must get the app_context and execute this
     file within it
 """
 
-# Get the app context
-app = return_app()
+if __name__ == "__main__":
+    # Get the app context
+    app = return_app()
 
-with app.app_context():
-    if __name__ == "__main__":
+    with app.app_context():
         if len(sys.argv) == 2:
             capture_directory = sys.argv[1]
             if os.path.isdir(capture_directory):
-
-                manager = Manager()
-                alerts = manager.dict()
-
-                def zeekengine(alerts):
-                    zeek = ZeekEngine(capture_directory)
-                    zeek.start_zeek()
-                    alerts["zeek"] = zeek.retrieve_alerts()
-
-                    # whitelist.json writing.
-                    with open(os.path.join(capture_directory, "assets/whitelist.json"), "w") as f:
-                        f.write(json.dumps(zeek.retrieve_whitelist(),
-                                        indent=4, separators=(',', ': ')))
-
-                    # conns.json writing.
-                    with open(os.path.join(capture_directory, "assets/conns.json"), "w") as f:
-                        f.write(json.dumps(zeek.retrieve_conns(),
-                                        indent=4, separators=(',', ': ')))
-
-                def snortengine(alerts):
-                    suricata = SuricataEngine(capture_directory)
-                    suricata.start_suricata()
-                    alerts["suricata"] = suricata.get_alerts()
-
-                # Start the engines.
-                p1 = Process(target=zeekengine, args=(alerts,))
-                p2 = Process(target=snortengine, args=(alerts,))
-                p1.start()
-                p2.start()
-
-                # Wait to their end.
-                p1.join()
-                p2.join()
-
-                # Some formating and alerts.json writing.
-                with open(os.path.join(capture_directory, "assets/alerts.json"), "w") as f:
-                    report = {"high": [], "moderate": [], "low": []}
-                    for alert in (alerts["zeek"] + alerts["suricata"]):
-                        if alert["level"] == "High":
-                            report["high"].append(alert)
-                        if alert["level"] == "Moderate":
-                            report["moderate"].append(alert)
-                        if alert["level"] == "Low":
-                            report["low"].append(alert)
-                    f.write(json.dumps(report, indent=4, separators=(',', ': ')))
-
-                # Generate the report
-                report = Report(capture_directory)
-                report =  report.generate_report()
-
-                #write the result in a json file
-                with open(os.path.join(capture_directory,"report.json"),"w") as r:
-                    r.write(report)
+                analyse(capture_directory)
             else:
                 print("The directory doesn't exist.")
         else:
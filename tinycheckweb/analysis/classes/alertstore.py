@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+class Alert(object):
+    """
+        An alert, raised as its id and the arguments of its title and
+        description, which are only rendered when the alerts are written.
+    """
+
+    __slots__ = ("id", "level", "host", "title_args", "description_args")
+
+    def __init__(self, alert_id, level, host, title_args=(), description_args=()):
+        self.id = alert_id
+        self.level = level
+        self.host = host
+        self.title_args = title_args
+        self.description_args = description_args
+
+    def key(self):
+        """
+            Get the identity of the alert, used to drop the duplicates.
+            :return: tuple
+        """
+        return (self.id, self.level, self.host, self.title_args, self.description_args)
+
+
+class AlertStore(object):
+    """
+        Set of alerts, deduplicated on insertion. The number of alerts of
+        each host and the alerts of each level are kept as they are added,
+        so the advices and the report don't have to go over them again.
+    """
+
+    LEVELS = ("High", "Moderate", "Low")
+
+    def __init__(self):
+        self.alerts = {}
+        self.hosts = {}
+        self.levels = {level: [] for level in self.LEVELS}
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def __iter__(self):
+        return iter(self.alerts.values())
+
+    def add(self, alert_id, level, host, title_args=(), description_args=()):
+        """
+            Add an alert, unless the same one has already been raised.
+            :return: bool - True if the alert is new.
+        """
+        alert = Alert(alert_id, level, host, title_args, description_args)
+        return self.insert(alert)
+
+    def insert(self, alert):
+        """
+            Insert an Alert record, unless the same one is already stored.
+            :return: bool - True if the alert is new.
+        """
+        key = alert.key()
+        if key in self.alerts:
+            return False
+
+        self.alerts[key] = alert
+        self.hosts[alert.host] = self.hosts.get(alert.host, 0) + 1
+        self.levels.setdefault(alert.level, []).append(alert)
+        return True
+
+    def remove(self, alert):
+        """
+            Remove a stored alert.
+            :return: nothing.
+        """
+        del self.alerts[alert.key()]
+        self.hosts[alert.host] -= 1
+        self.levels[alert.level].remove(alert)
+
+    def update(self, store):
+        """
+            Add the alerts of another store.
+            :return: nothing.
+        """
+        for alert in store:
+            self.insert(alert)
+
+    def count_host(self, host):
+        """
+            Get the number of distinct alerts raised for a host.
+            :return: int
+        """
+        return self.hosts.get(host, 0)
+
+    def level(self, level):
+        """
+            Get the alerts of a level, in their order of insertion.
+            :return: list of Alert
+        """
+        return self.levels.get(level, [])
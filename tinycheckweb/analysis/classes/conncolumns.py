@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from array import array
+from classes.zeeklogreader import open_zeek_log
+
+
+class Interner(object):
+    """
+        Map each distinct value of a column to a small integer code.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        """
+            Get the code of a value, allocating a new one if needed.
+            :return: int
+        """
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ConnColumns(object):
+    """
+        Columnar store of the distinct connections of conn.log files.
+        Addresses, protocols and services are interned and kept as codes
+        in typed arrays next to the destination ports, which is several
+        times smaller than a list of dicts and lets the checks evaluate a
+        predicate once per distinct value instead of once per connection.
+    """
+
+    FIELDS = ["id.resp_h", "proto", "id.resp_p", "service"]
+    INTERNED = ("ip", "proto", "service")
+
+    def __init__(self):
+        self.addresses = Interner()
+        self.protos = Interner()
+        self.services = Interner()
+        self.ip = array("L")
+        self.proto = array("B")
+        self.port = array("H")
+        self.service = array("H")
+        self.rows = {}
+
+    def load(self, filepath):
+        """
+            Append the connections of a conn.log which are not already stored.
+            :return: nothing.
+        """
+        for record in open_zeek_log(filepath, fields=self.FIELDS):
+            self.append(record["id.resp_h"], record["proto"],
+                        record["id.resp_p"], record["service"])
+
+    def append(self, ip_dst, proto, port_dst, service):
+        """
+            Append a connection if it is not already stored.
+            :return: int - row of the connection.
+        """
+        ip_code = self.addresses.code(ip_dst)
+        proto_code = self.protos.code(proto)
+        service_code = self.services.code(service)
+
+        key = (ip_code << 40) | (proto_code << 32) | (port_dst << 16) | service_code
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.ip)
+            self.ip.append(ip_code)
+            self.proto.append(proto_code)
+            self.port.append(port_dst)
+            self.service.append(service_code)
+        return row
+
+    def interner(self, column):
+        """
+            Get the interner of a coded column.
+            :return: Interner
+        """
+        return {"ip": self.addresses, "proto": self.protos, "service": self.services}[column]
+
+    def mask(self, column, predicate):
+        """
+            Evaluate a predicate over a whole column. The predicate is only
+            called once per distinct value of the column.
+            :return: bytearray - 1 for the rows matching the predicate.
+        """
+        values = getattr(self, column)
+        if column in self.INTERNED:
+            codes = {code for code, value in enumerate(self.interner(column)) if predicate(value)}
+        else:
+            codes = {value for value in set(values) if predicate(value)}
+        return bytearray(value in codes for value in values)
+
+    def get(self, row):
+        """
+            Get a stored connection.
+            :return: tuple (ip_dst, proto, port_dst, service)
+        """
+        return (self.addresses.values[self.ip[row]],
+                self.protos.values[self.proto[row]],
+                self.port[row],
+                self.services.values[self.service[row]])
+
+    def __len__(self):
+        return len(self.ip)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils import get_config_int, parent
+import subprocess as sp
+import sqlite3
+import json
+import time
+import os
+import pydig
+import whois
+
+
+class EnrichmentCache(object):
+    """
+        Persistent cache of the active lookups, stored in a SQLite
+        database next to tinycheck.sqlite3. Entries expire after ttl seconds.
+    """
+
+    def __init__(self, path=None, ttl=86400):
+        self.path = path or os.path.join(parent, "enrichment.sqlite3")
+        self.ttl = ttl
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS lookups ("
+                        "kind TEXT NOT NULL, domain TEXT NOT NULL, "
+                        "value TEXT, expires REAL NOT NULL, "
+                        "PRIMARY KEY (kind, domain))")
+        self.db.commit()
+
+    def get(self, kind, domain):
+        """
+            Get a cached lookup result.
+            :return: tuple (bool - found, value)
+        """
+        row = self.db.execute("SELECT value FROM lookups WHERE kind = ? AND domain = ? AND expires > ?",
+                              (kind, domain, time.time())).fetchone()
+        return (True, json.loads(row[0])) if row is not None else (False, None)
+
+    def set(self, kind, domain, value):
+        """
+            Store a lookup result.
+            :return: nothing.
+        """
+        self.db.execute("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?)",
+                        (kind, domain, json.dumps(value), time.time() + self.ttl))
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+
+class ActiveEnrichment(object):
+    """
+        Enrichment stage of the active analysis. Each distinct domain is
+        looked up once: cached results are reused and the missing NS and
+        WHOIS lookups run concurrently in a bounded thread pool, each one
+        bounded by a timeout.
+
+        The resolver and the WHOIS lookup can be replaced, e.g. to query
+        a local stub resolver or WHOIS server.
+    """
+
+    def __init__(self, cache=None, resolver=None, whois_lookup=None):
+        self.workers = get_config_int(("analysis", "active_workers"), 1)
+        self.timeout = get_config_int(("analysis", "active_timeout"), 5)
+        self.cache = cache or EnrichmentCache(ttl=get_config_int(("analysis", "active_cache_ttl")))
+        self.resolver = resolver or pydig.Resolver(
+            additional_args=["+time={}".format(self.timeout), "+tries=1"])
+        self.whois_lookup = whois_lookup or self.query_whois
+
+    def lookup_ns(self, domain):
+        """
+            Get the name servers of a domain.
+            :return: list of name servers.
+        """
+        return self.resolver.query(domain, "NS")
+
+    # Suffixes parsed with their own rules by the whois package, as in whois.query.
+    WHOIS_TLDS = ((".co.jp", "co_jp"), (".com.au", "com_au"), (".ac.uk", "ac_uk"),
+                  (".xn--p1ai", "ru_rf"), (".is", "is_is"), (".in", "in_"))
+
+    def query_whois(self, domain):
+        """
+            Get the WHOIS record of a domain from the whois command, which
+            is killed after the timeout, parsed by the whois package.
+            :return: whois.Domain or None if the domain isn't found.
+        """
+        output = sp.run(["whois", domain], stdout=sp.PIPE, stderr=sp.DEVNULL,
+                        timeout=self.timeout, universal_newlines=True).stdout
+        tld = next((t for suffix, t in self.WHOIS_TLDS if domain.endswith(suffix)), domain.split(".")[-1])
+        record = whois.do_parse(output, tld)
+        return whois.Domain(record) if record and record["domain_name"][0] else None
+
+    def lookup_whois(self, domain):
+        """
+            Get the creation date of a domain from its WHOIS record.
+            :return: str - creation date in ISO format or None.
+        """
+        record = self.whois_lookup(domain)
+        if record is None:
+            return None
+        creation_date = record.creation_date if type(
+            record.creation_date) is not list else record.creation_date[0]
+        return creation_date.isoformat() if isinstance(creation_date, datetime) else None
+
+    def run(self, kind, domain):
+        """
+            Run a lookup, errors and timeouts being reported as None.
+            :return: tuple (kind, domain, bool - succeed, value)
+        """
+        try:
+            if kind == "ns":
+                return kind, domain, True, self.lookup_ns(domain)
+            return kind, domain, True, self.lookup_whois(domain)
+        except Exception:
+            return kind, domain, False, None
+
+    def enrich(self, domains):
+        """
+            Get the name servers and the creation date of some domains.
+            :return: dict - {domain: {"ns": list or None, "creation_date": datetime or None}}
+        """
+        results = {d: {"ns": None, "whois": None} for d in set(domains)}
+        missing = []
+
+        for domain in results:
+            for kind in ("ns", "whois"):
+                found, value = self.cache.get(kind, domain)
+                if found:
+                    results[domain][kind] = value
+                else:
+                    missing.append((kind, domain))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for kind, domain, succeed, value in pool.map(lambda l: self.run(*l), missing):
+                    results[domain][kind] = value
+                    if succeed:
+                        self.cache.set(kind, domain, value)
+        finally:
+            self.cache.commit()
+
+        for record in results.values():
+            creation_date = record.pop("whois")
+            record["creation_date"] = datetime.fromisoformat(creation_date) if creation_date else None
+
+        return results
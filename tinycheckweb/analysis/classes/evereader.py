@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Use the fastest JSON decoder available.
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+class EveReader(object):
+    """
+        Streaming reader of the suricata eve.json log. Lines are read one
+        at a time and only the events of the selected types are decoded:
+        the other ones are skipped on a substring test of the raw line,
+        against the event_type member as written by suricata (without
+        spaces).
+    """
+
+    def __init__(self, filepath, event_types=("alert",)):
+        self.fd = open(filepath, "rb")
+        self.event_types = set(event_types)
+        self.markers = ['"event_type":"{}"'.format(t).encode() for t in event_types]
+
+    def __del__(self):
+        if hasattr(self, "fd"):
+            self.fd.close()
+
+    def __iter__(self):
+        for line in self.fd:
+            if not any(m in line for m in self.markers):
+                continue
+            try:
+                event = loads(line)
+            except ValueError:
+                # Last line of a log still being written.
+                continue
+            if event.get("event_type") in self.event_types:
+                yield event
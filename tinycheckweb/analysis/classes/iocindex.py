@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from netaddr import IPNetwork, IPAddress
+from utils import get_iocs
+
+
+class SuffixTrie(object):
+    """
+        Trie built on the reversed characters of its keys. It returns
+        every inserted key which is a suffix of a given string, which
+        is exactly the str.endswith() semantic used by the checks.
+    """
+
+    END = None
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def insert(self, key, value):
+        """
+            Insert a key and attach a value to it.
+            :return: nothing.
+        """
+        node = self.root
+        for char in reversed(key):
+            node = node.setdefault(char, {})
+        node.setdefault(self.END, []).append((self.size, value))
+        self.size += 1
+
+    def match(self, string):
+        """
+            Get the values of all the keys which are suffixes of string.
+            :return: list - values ordered by insertion.
+        """
+        matches = []
+        node = self.root
+        if self.END in node:
+            matches += node[self.END]
+        for char in reversed(string):
+            node = node.get(char)
+            if node is None:
+                break
+            if self.END in node:
+                matches += node[self.END]
+        return [value for _, value in sorted(matches, key=lambda m: m[0])]
+
+    def has_suffix(self, string):
+        """
+            Check if at least one key is a suffix of string.
+            :return: bool
+        """
+        node = self.root
+        if self.END in node:
+            return True
+        for char in reversed(string):
+            node = node.get(char)
+            if node is None:
+                return False
+            if self.END in node:
+                return True
+        return False
+
+    def __len__(self):
+        return self.size
+
+
+class CIDRIndex(object):
+    """
+        Index of networks grouped by IP version and prefix length. An
+        address is checked with one hash lookup per distinct prefix
+        length instead of one containment test per network.
+    """
+
+    WIDTHS = {4: 32, 6: 128}
+
+    def __init__(self):
+        self.networks = {}
+        self.prefixes = {4: [], 6: []}
+        self.size = 0
+
+    def insert(self, network, value):
+        """
+            Insert a network (IPNetwork or string) and attach a value to it.
+            :return: nothing.
+        """
+        network = IPNetwork(network)
+        version, prefixlen = network.version, network.prefixlen
+        key = (version, prefixlen, network.value >> (self.WIDTHS[version] - prefixlen))
+        self.networks.setdefault(key, []).append((self.size, value))
+        if prefixlen not in self.prefixes[version]:
+            self.prefixes[version].append(prefixlen)
+            self.prefixes[version].sort(reverse=True)
+        self.size += 1
+
+    def lookup(self, address):
+        """
+            Iterate over the buckets matching an address, from the
+            longest prefix to the shortest one.
+            :return: generator of list of (position, value).
+        """
+        address = IPAddress(address)
+        width = self.WIDTHS[address.version]
+        for prefixlen in self.prefixes[address.version]:
+            bucket = self.networks.get(
+                (address.version, prefixlen, address.value >> (width - prefixlen)))
+            if bucket is not None:
+                yield bucket
+
+    def match(self, address):
+        """
+            Get the values of all the networks containing address.
+            :return: list - values ordered by insertion.
+        """
+        matches = []
+        for bucket in self.lookup(address):
+            matches += bucket
+        return [value for _, value in sorted(matches, key=lambda m: m[0])]
+
+    def longest(self, address):
+        """
+            Get the value of the most specific network containing address.
+            :return: value or None.
+        """
+        for bucket in self.lookup(address):
+            return bucket[0][1]
+        return None
+
+    def __len__(self):
+        return self.size
+
+
+class IOCIndex(object):
+    """
+        Prebuilt index of the IOCs used by the netflow checks, so each
+        connection is matched with a few lookups instead of a scan of
+        every IOC.
+    """
+
+    def __init__(self):
+        self.hosts = {}
+        self.cidrs = CIDRIndex()
+        self.domains = SuffixTrie()
+        self.freedns = SuffixTrie()
+        self.nameservers = SuffixTrie()
+        self.tlds = SuffixTrie()
+        self.load()
+
+    def load(self):
+        """
+            Fill the index from the IOCs stored in the database.
+            :return: nothing.
+        """
+        for host in get_iocs("ip4addr") + get_iocs("ip6addr"):
+            # Only the first matching host raises an alert.
+            self.hosts.setdefault(host[0], host)
+        for cidr in get_iocs("cidr"):
+            self.cidrs.insert(cidr[0], [IPNetwork(cidr[0]), cidr[1]])
+        for domain in get_iocs("domain"):
+            self.domains.insert(domain[0], domain)
+        for domain in get_iocs("freedns"):
+            self.freedns.insert("." + domain[0], domain)
+        for ns in get_iocs("ns"):
+            self.nameservers.insert(".{}.".format(ns[0]), ns)
+        for tld in get_iocs("tld"):
+            self.tlds.insert(tld[0], tld)
+
+    def match_host(self, ip_addr):
+        """
+            Get the blacklisted host matching an IP address.
+            :return: list [value, tag] or None.
+        """
+        return self.hosts.get(ip_addr)
+
+    def match_cidrs(self, ip_addr):
+        """
+            Get the blacklisted networks containing an IP address.
+            :return: list of [IPNetwork, tag].
+        """
+        return self.cidrs.match(ip_addr)
+
+    def match_domains(self, domain):
+        """
+            Get the blacklisted domains ending a domain name.
+            :return: list of [value, tag].
+        """
+        return self.domains.match(domain)
+
+    def match_freedns(self, domain):
+        """
+            Get the free DNS domains of which domain is a subdomain.
+            :return: list of [value, tag].
+        """
+        return self.freedns.match(domain)
+
+    def match_nameservers(self, name_server):
+        """
+            Get the blacklisted name servers domains of a name server.
+            :return: list of [value, tag].
+        """
+        return self.nameservers.match(name_server)
+
+    def match_tlds(self, domain):
+        """
+            Get the suspect TLDs ending a domain name.
+            :return: list of [value, tag].
+        """
+        return self.tlds.match(domain)
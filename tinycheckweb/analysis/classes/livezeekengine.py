@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from classes.zeekengine import ZeekEngine, index_dns, distinct_certs, distinct_files, \
+    DNS_FIELDS, SSL_FIELDS, FILES_FIELDS
+from classes.zeeklogreader import ZeekLogTailer
+from classes.conncolumns import ConnColumns
+from classes.alertstore import AlertStore
+import os
+
+
+class LiveZeekEngine(ZeekEngine):
+    """
+        Incremental ZeekEngine, for the captures still being recorded. The
+        logs written by Zeek are followed, and each poll feeds their new
+        records to the checks. The running state is kept from a poll to the
+        next one: the DNS index, the distinct connections, certificates and
+        files, and the alert store with its per-host counters, so an alert
+        can be published as soon as it triggers.
+
+        The connections are resolved with the answers seen before them,
+        Zeek logging a DNS query before the end of the connections using it.
+        Once the capture ended, finish checks all the records again, so the
+        results are the ones, in the same order, of a batch analysis.
+    """
+
+    CONN_FIELDS = ["id.resp_h", "proto", "id.resp_p", "service"]
+
+    def __init__(self, capture_directory, log_directory, ioc_index=None, whitelist_matcher=None):
+        super().__init__(capture_directory, ioc_index, whitelist_matcher)
+        self.distinct_conns = ConnColumns()
+        self.ssl_seen = set()
+        self.files_seen = set()
+        self.all_files = []
+        self.tailers = {"dns": ZeekLogTailer(os.path.join(log_directory, "dns.log"), DNS_FIELDS),
+                        "conn": ZeekLogTailer(os.path.join(log_directory, "conn.log"), self.CONN_FIELDS),
+                        "ssl": ZeekLogTailer(os.path.join(log_directory, "ssl.log"), SSL_FIELDS),
+                        "files": ZeekLogTailer(os.path.join(log_directory, "files.log"), FILES_FIELDS)}
+
+    def poll(self):
+        """
+            Read the records written since the previous poll and check them.
+            :return: int - number of new alerts.
+        """
+        nb_alerts = len(self.alerts)
+        index_dns(self.tailers["dns"], self.dns_index)
+
+        # The connections not seen yet are checked as a batch.
+        batch = ConnColumns()
+        for record in self.tailers["conn"]:
+            conn = (record["id.resp_h"], record["proto"], record["id.resp_p"], record["service"])
+            rows = len(self.distinct_conns)
+            if self.distinct_conns.append(*conn) == rows:
+                batch.append(*conn)
+        if len(batch):
+            self.conn_columns = batch
+            self.netflow_check()
+
+        # A new certificate or new conns can match the conns of any certificate.
+        certs = list(distinct_certs(self.tailers["ssl"], self.ssl_seen))
+        self.ssl += certs
+        if certs or len(batch):
+            self.ssl_check()
+
+        self.files = list(distinct_files(self.tailers["files"], self.files_seen))
+        self.all_files += self.files
+        self.files_check()
+        self.alerts_check()
+        return len(self.alerts) - nb_alerts
+
+    def finish(self):
+        """
+            Check all the records read since the start, as a batch analysis
+            of the whole logs would: the alerts, conns and whitelist are
+            rebuilt in its order. The logs aren't read again, and the active
+            lookups come from their cache.
+            :return: nothing.
+        """
+        self.alerts = AlertStore()
+        self.advices = []
+        self.conns = []
+        self.whitelist = {}
+        self.conn_columns = self.distinct_conns
+        self.files = self.all_files
+        self.netflow_check()
+        self.ssl_check()
+        self.files_check()
+        self.alerts_check()
+
+    def retrieve_conns(self):
+        """
+            Retrieve not whitelisted elements.
+            :return: list - a list of non-whitelisted elements wihout duplicates.
+        """
+        return sorted(self.conns, key=lambda c: c["resolution"])
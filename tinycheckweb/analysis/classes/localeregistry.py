@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from string import Formatter
+import json
+import os
+
+
+class LocaleRegistry(object):
+    """
+        Registry of the locale files, all loaded once per process. Each
+        language is checked against the reference one (english): the
+        missing entries, and the templates using placeholders which the
+        reference doesn't provide, are replaced by the reference ones so
+        formatting them can't fail during an analysis.
+
+        The alerts are raised as their id and arguments, and only
+        rendered in the user language when they are written.
+    """
+
+    REFERENCE = "en"
+
+    def __init__(self, directory):
+        self.languages = {}
+        self.errors = []
+        locales = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), "r") as f:
+                    locales[name[:-len(".json")]] = json.load(f)
+
+        reference = locales[self.REFERENCE]
+        self.check(reference, reference, self.REFERENCE)
+        for lang, locale in locales.items():
+            self.languages[lang] = self.check(reference, locale, lang)
+
+        # Bound format methods of the alert templates, by language.
+        self.formatters = {lang: {alert_id: (t["title"].format, t["description"].format)
+                                  for alert_id, t in locale["alerts"].items()}
+                           for lang, locale in self.languages.items()}
+
+    @staticmethod
+    def placeholders(template):
+        """
+            Get the fields used by a template, the automatic ones being
+            numbered like the manual ones.
+            :return: set, raises ValueError on an invalid template.
+        """
+        fields, auto, manual = set(), 0, False
+        for _, name, _, _ in Formatter().parse(template):
+            if name is None:
+                continue
+            field = name.split(".")[0].split("[")[0]
+            if field == "":
+                if manual:
+                    raise ValueError("mixed automatic and manual field numbering")
+                fields.add(str(auto))
+                auto += 1
+            else:
+                manual = manual or field.isdigit()
+                fields.add(field)
+        return fields
+
+    def check(self, reference, locale, lang, path=()):
+        """
+            Check a locale against the reference one.
+            :return: the locale, fixed with the reference entries.
+        """
+        if isinstance(reference, dict):
+            if not isinstance(locale, dict):
+                self.errors.append("{}: {} is not an object".format(lang, ".".join(path)))
+                return reference
+            checked = {}
+            for key, value in reference.items():
+                if key not in locale:
+                    self.errors.append("{}: {} is missing".format(lang, ".".join(path + (key,))))
+                    checked[key] = value
+                else:
+                    checked[key] = self.check(value, locale[key], lang, path + (key,))
+            return checked
+
+        if isinstance(reference, str):
+            try:
+                if not isinstance(locale, str) or not self.placeholders(locale) <= self.placeholders(reference):
+                    raise ValueError("placeholders don't match the reference")
+            except ValueError as e:
+                if lang == self.REFERENCE:
+                    raise ValueError("{}: {}: {}".format(lang, ".".join(path), e))
+                self.errors.append("{}: {}: {}".format(lang, ".".join(path), e))
+                return reference
+            return locale
+
+        if type(locale) is not type(reference) or \
+                (isinstance(reference, list) and len(locale) != len(reference)):
+            self.errors.append("{}: {} doesn't match the reference".format(lang, ".".join(path)))
+            return reference
+        return locale
+
+    def get(self, lang):
+        """
+            Get the templates of a language, or the reference ones.
+            :return: dict
+        """
+        return self.languages.get(lang, self.languages[self.REFERENCE])
+
+    def render_alert(self, lang, alert):
+        """
+            Render an Alert record.
+            :return: dict - the alert with its title and description.
+        """
+        formatters = self.formatters.get(lang, self.formatters[self.REFERENCE])
+        title, description = formatters[alert.id]
+        return {"title": title(*alert.title_args),
+                "description": description(*alert.description_args),
+                "host": alert.host,
+                "level": alert.level,
+                "id": alert.id}
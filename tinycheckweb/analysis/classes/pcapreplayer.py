@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from classes.pcapsharder import PcapSharder
+import struct
+import time
+import os
+
+
+class PcapReplayer(object):
+    """
+        Replay a pcap or pcapng capture into a growing file, at a given
+        number of packets per second, as if it was being recorded. Used
+        to test the live analysis with the captures of medias/captures.
+
+        The file is flushed after each packet, like tcpdump -U does, the
+        pcapng blocks which aren't packets being written as they come.
+    """
+
+    PACKET_BLOCKS = (2, 3, 6)
+
+    def __init__(self, source, destination, rate=100):
+        self.source = source
+        self.destination = destination
+        self.rate = rate
+
+    def run(self, stop=None):
+        """
+            Replay the capture, until its end or until the stop event is set.
+            :return: int - number of replayed packets.
+        """
+        with open(self.source, "rb") as f:
+            # The destination can be a hardlink of the uploaded capture
+            # (see link_or_copy): it is replaced, never truncated.
+            if os.path.lexists(self.destination):
+                os.unlink(self.destination)
+            with open(self.destination, "wb") as output:
+                magic = f.read(4)
+                f.seek(0)
+                if magic in PcapSharder.PCAP_MAGICS:
+                    records = self.pcap_records(f)
+                elif magic == PcapSharder.PCAPNG_MAGIC:
+                    records = self.pcapng_records(f)
+                else:
+                    raise ValueError("Not a pcap or pcapng file")
+
+                packets, start = 0, time.monotonic()
+                for data, is_packet in records:
+                    if stop is not None and stop.is_set():
+                        break
+                    output.write(data)
+                    if is_packet:
+                        output.flush()
+                        packets += 1
+                        delay = start + packets / self.rate - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+        return packets
+
+    @staticmethod
+    def pcap_records(f):
+        """
+            Read the header and the records of a classic pcap file.
+            :return: generator of (bytes, is_packet).
+        """
+        header = f.read(24)
+        endian = PcapSharder.PCAP_MAGICS[header[:4]]
+        yield header, False
+        while True:
+            record = f.read(16)
+            if len(record) < 16:
+                return
+            length, = struct.unpack_from(endian + "I", record, 8)
+            yield record + f.read(length), True
+
+    @classmethod
+    def pcapng_records(cls, f):
+        """
+            Read the blocks of a pcapng file.
+            :return: generator of (bytes, is_packet).
+        """
+        endian = "<"
+        while True:
+            header = f.read(12)
+            if len(header) < 12:
+                return
+            if header[:4] == PcapSharder.PCAPNG_MAGIC:
+                endian = PcapSharder.PCAPNG_BYTE_ORDER[header[8:12]]
+            block_type, length = struct.unpack_from(endian + "II", header)
+            yield header + f.read(length - 12), block_type in cls.PACKET_BLOCKS
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import struct
+import zlib
+import os
+
+
+class PcapSharder(object):
+    """
+        Split a pcap or pcapng capture into flow-consistent shards. Each
+        packet goes to the shard given by a symmetric hash of its source
+        and destination addresses, so both directions of a connection end
+        up in the same shard. The ports aren't hashed, as they can't be
+        read from every packet of a flow (IP fragments, IPv6 extension
+        headers): all the packets of a pair of hosts go to the same shard,
+        which is what Zeek needs to reassemble them. Non-IP packets go to
+        the first shard.
+
+        Every shard starts with the headers of the capture (and, for
+        pcapng, gets all its non-packet blocks), so each one is a valid
+        capture on its own.
+    """
+
+    PCAP_MAGICS = {b"\xd4\xc3\xb2\xa1": "<", b"\xa1\xb2\xc3\xd4": ">",
+                   b"\x4d\x3c\xb2\xa1": "<", b"\xa1\xb2\x3c\x4d": ">"}
+    PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+    PCAPNG_BYTE_ORDER = {b"\x4d\x3c\x2b\x1a": "<", b"\x1a\x2b\x3c\x4d": ">"}
+
+    # Offset of the network layer for the supported link types, None
+    # meaning that the EtherType has to be read (Ethernet).
+    LINK_OFFSETS = {1: None, 12: 0, 14: 0, 101: 0, 113: 16, 276: 20}
+    VLAN_TYPES = (0x8100, 0x88a8, 0x9100)
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+    def split(self, directory, shards):
+        """
+            Split the capture into shards, written as <directory>/<n>/capture.pcap.
+            :return: list of the shard directories.
+        """
+        directories = [os.path.join(directory, str(n)) for n in range(shards)]
+        outputs = []
+        try:
+            for d in directories:
+                os.makedirs(d, exist_ok=True)
+                outputs.append(open(os.path.join(d, "capture.pcap"), "wb"))
+
+            with open(self.filepath, "rb") as f:
+                magic = f.read(4)
+                f.seek(0)
+                if magic in self.PCAP_MAGICS:
+                    self.split_pcap(f, outputs)
+                elif magic == self.PCAPNG_MAGIC:
+                    self.split_pcapng(f, outputs)
+                else:
+                    raise ValueError("Not a pcap or pcapng file")
+        finally:
+            for output in outputs:
+                output.close()
+        return directories
+
+    def split_pcap(self, f, outputs):
+        """
+            Split a classic pcap file.
+            :return: nothing.
+        """
+        header = f.read(24)
+        endian = self.PCAP_MAGICS[header[:4]]
+        link_type = struct.unpack_from(endian + "I", header, 20)[0] & 0x0fffffff
+        for output in outputs:
+            output.write(header)
+
+        shards = len(outputs)
+        while True:
+            record = f.read(16)
+            if len(record) < 16:
+                break
+            length, = struct.unpack_from(endian + "I", record, 8)
+            packet = f.read(length)
+            output = outputs[self.shard(link_type, packet, shards)]
+            output.write(record)
+            output.write(packet)
+
+    def split_pcapng(self, f, outputs):
+        """
+            Split a pcapng file. The blocks which aren't packets (section
+            headers, interface descriptions, statistics...) are written
+            to every shard, to keep the interface ids valid.
+            :return: nothing.
+        """
+        endian = "<"
+        link_types = []
+        shards = len(outputs)
+        while True:
+            header = f.read(12)
+            if len(header) < 12:
+                break
+            if header[:4] == self.PCAPNG_MAGIC:
+                endian = self.PCAPNG_BYTE_ORDER[header[8:12]]
+                link_types = []
+            block_type, length = struct.unpack_from(endian + "II", header)
+            block = header + f.read(length - 12)
+
+            if block_type == 6:  # Enhanced Packet Block
+                interface, = struct.unpack_from(endian + "I", block, 8)
+                caplen, = struct.unpack_from(endian + "I", block, 20)
+                packet = block[28:28 + caplen]
+            elif block_type == 3:  # Simple Packet Block
+                interface = 0
+                caplen = min(struct.unpack_from(endian + "I", block, 8)[0], length - 16)
+                packet = block[12:12 + caplen]
+            elif block_type == 2:  # Packet Block (obsolete)
+                interface, = struct.unpack_from(endian + "H", block, 8)
+                caplen, = struct.unpack_from(endian + "I", block, 20)
+                packet = block[28:28 + caplen]
+            else:
+                if block_type == 1:  # Interface Description Block
+                    link_types.append(struct.unpack_from(endian + "H", block, 8)[0])
+                for output in outputs:
+                    output.write(block)
+                continue
+
+            link_type = link_types[interface] if interface < len(link_types) else None
+            outputs[self.shard(link_type, packet, shards)].write(block)
+
+    def shard(self, link_type, packet, shards):
+        """
+            Get the shard of a packet.
+            :return: int
+        """
+        key = self.flow_key(link_type, packet)
+        return zlib.crc32(key) % shards if key is not None else 0
+
+    def flow_key(self, link_type, packet):
+        """
+            Build the symmetric flow key of a packet: the sorted addresses
+            of both ends.
+            :return: bytes or None for non-IP packets.
+        """
+        if link_type not in self.LINK_OFFSETS:
+            return None
+
+        offset = self.LINK_OFFSETS[link_type]
+        if offset is None:
+            offset, ether_type = 14, packet[12:14]
+            while len(ether_type) == 2 and int.from_bytes(ether_type, "big") in self.VLAN_TYPES:
+                ether_type = packet[offset + 2:offset + 4]
+                offset += 4
+            if ether_type not in (b"\x08\x00", b"\x86\xdd"):
+                return None
+
+        version = packet[offset] >> 4 if len(packet) > offset else 0
+        if version == 4 and len(packet) >= offset + 20:
+            src, dst = packet[offset + 12:offset + 16], packet[offset + 16:offset + 20]
+        elif version == 6 and len(packet) >= offset + 40:
+            src, dst = packet[offset + 8:offset + 24], packet[offset + 24:offset + 40]
+        else:
+            return None
+        return b"".join(sorted((src, dst)))
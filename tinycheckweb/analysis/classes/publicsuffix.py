@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from netaddr import valid_ipv4, valid_ipv6
+import os
+
+
+class PublicSuffixList(object):
+    """
+        Offline public suffix list, read from the copy of
+        https://publicsuffix.org/list/public_suffix_list.dat bundled in
+        the assets directory. It reduces hostnames to their registrable
+        domain (eTLD+1).
+    """
+
+    PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                        "assets/public_suffix_list.dat")
+
+    def __init__(self, path=PATH):
+        self.rules = set()
+        self.wildcards = set()
+        self.exceptions = set()
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                rule = line.strip()
+                if not rule or rule.startswith("//"):
+                    continue
+                rule = rule.split()[0].lower()
+                if rule.startswith("!"):
+                    self.exceptions.add(rule[1:])
+                elif rule.startswith("*."):
+                    self.wildcards.add(rule[2:])
+                else:
+                    self.rules.add(rule)
+
+    def suffix_index(self, labels):
+        """
+            Find where the public suffix of a list of labels starts,
+            by looking for the longest matching rule.
+            :return: int - index of the first label of the suffix.
+        """
+        for i in range(len(labels)):
+            candidate = ".".join(labels[i:])
+            if candidate in self.exceptions:
+                return i + 1
+            if candidate in self.rules:
+                return i
+            if i + 1 < len(labels) and ".".join(labels[i + 1:]) in self.wildcards:
+                return i
+        # The default rule is "*".
+        return len(labels) - 1
+
+    def registrable_domain(self, domain):
+        """
+            Reduce a hostname to its registrable domain. IP addresses and
+            public suffixes are returned unchanged.
+            :return: str
+        """
+        if valid_ipv4(domain) or valid_ipv6(domain):
+            return domain
+
+        labels = domain.lower().strip(".").split(".")
+        if not all(labels):
+            return domain
+
+        i = self.suffix_index(labels)
+        return ".".join(labels[i - 1:]) if i > 0 else domain
+
+
+_public_suffix_list = None
+
+
+def registrable_domain(domain):
+    """
+        Reduce a hostname to its registrable domain, loading the
+        bundled public suffix list once per process.
+        :return: str
+    """
+    global _public_suffix_list
+    if _public_suffix_list is None:
+        _public_suffix_list = PublicSuffixList()
+    return _public_suffix_list.registrable_domain(domain)
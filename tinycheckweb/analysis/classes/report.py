@@ -2,18 +2,16 @@ import weasyprint
 import os
 import json
 import hashlib
-import re
-import sys
 
 from weasyprint import HTML
 from pathlib import Path
 from datetime import datetime
-from utils import get_config
+from utils import get_template
 
 
 class Report(object):
 
-    def __init__(self, capture_directory):
+    def __init__(self, capture_directory, capture_sha1=None):
         self.capture_directory = capture_directory
         self.alerts = self.read_json(os.path.join(
             capture_directory, "assets/alerts.json"))
@@ -21,19 +19,24 @@ class Report(object):
             capture_directory, "assets/whitelist.json"))
         self.conns = self.read_json(os.path.join(
             capture_directory, "assets/conns.json"))
+        self.capture_sha1 = capture_sha1 or self.hash_capture()
+
+        # Load template language
+        self.template = get_template("report")
+
+    def hash_capture(self):
+        """
+            Hash the capture by chunks, without loading it in memory.
+            :return: str - SHA1 hex digest or "N/A".
+        """
+        sha1 = hashlib.sha1()
         try:
             with open(os.path.join(self.capture_directory, "capture.pcap"), "rb") as f:
-                self.capture_sha1 = hashlib.sha1(f.read()).hexdigest()
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha1.update(chunk)
         except:
-            self.capture_sha1 = "N/A"
-
-        self.userlang = get_config(("frontend", "user_lang"))
-
-        # Load template language
-        if not re.match("^[a-z]{2,3}$", self.userlang):
-            self.userlang = "en"
-        with open(os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), "locales/{}.json".format(self.userlang))) as f:
-            self.template = json.load(f)["report"]
+            return "N/A"
+        return sha1.hexdigest()
 
     def read_json(self, json_path):
         """
@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from utils import get_iocs, get_config
-import time
+from classes.evereader import EveReader
+from classes.suricatasocket import SuricataSocket
+from classes.alertstore import AlertStore
+from utils import get_iocs, get_config_str, parent
+import hashlib
 import os
 import subprocess as sp
-import re
-import json
-import sys
 
 
 
@@ -17,42 +17,78 @@ class SuricataEngine():
     def __init__(self, capture_directory):
 
         self.wdir = capture_directory
-        self.alerts = []
-        self.rules_file = "/tmp/rules.rules"
+        self.alerts = AlertStore()
+        self.rules_dir = os.path.join(parent, "rules")
+        self.rules_file = None
+        self.log_dir = os.path.join(self.wdir, "suricata")
+        self.socket_path = get_config_str(("analysis", "suricata_socket"))
         self.pcap_path = os.path.join(self.wdir, "capture.pcap")
         self.rules = [r[0] for r in get_iocs("snort")]
 
-        self.userlang = get_config(("frontend", "user_lang"))
-
-        # Load template language
-        if not re.match("^[a-z]{2,3}$", self.userlang):
-            self.userlang = "en"
-        with open(os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), "locales/{}.json".format(self.userlang))) as f:
-            self.template = json.load(f)["alerts"]
-
     def start_suricata(self):
         """
-            Launch suricata against the capture.pcap file.
+            Launch suricata against the capture.pcap file, or submit it to
+            the suricata daemon if suricata_socket is set and reachable.
             :return: nothing.
         """
 
         # Generate the rule file and launch suricata.
         if self.generate_rule_file():
-            sp.Popen(["suricata", "-S", self.rules_file, "-r",
-                      self.pcap_path, "-l", "/tmp/"]).wait()
+            os.makedirs(self.log_dir, exist_ok=True)
+            if not (self.socket_path and self.submit_pcap()):
+                sp.Popen(["suricata", "-S", self.rules_file, "-r",
+                          self.pcap_path, "-l", self.log_dir]).wait()
+            self.read_alerts(os.path.join(self.log_dir, "eve.json"))
 
+    def submit_pcap(self):
+        """
+            Submit the capture to the suricata daemon.
+            :return: bool if operation succeed.
+        """
+        try:
+            with SuricataSocket(self.socket_path) as daemon, SuricataSocket.rules_lock(self.rules_file):
+                daemon.load_rules(self.rules_file)
+                daemon.pcap_file(self.pcap_path, self.log_dir)
+            return True
+        except OSError:
+            return False
 
     def generate_rule_file(self):
         """
-            Generate the rules file passed to suricata.
+            Generate the rules file passed to suricata. Rule files are
+            named after the hash of their content, so they are only written
+            once for a given set of rules and never modified afterwards.
             :return: bool if operation succeed.
         """
+        content = "\n".join(self.rules)
+        self.rules_file = os.path.join(self.rules_dir, "{}.rules".format(
+            hashlib.sha1(content.encode()).hexdigest()))
+        if os.path.isfile(self.rules_file):
+            return True
+
         try:
-            with open(self.rules_file, "w+") as f:
-                f.write("\n".join(self.rules))
-                return True
+            os.makedirs(self.rules_dir, exist_ok=True)
+            tmp = "{}.{}".format(self.rules_file, os.getpid())
+            with open(tmp, "w+") as f:
+                f.write(content)
+            os.replace(tmp, self.rules_file)
+            return True
         except:
             return False
 
+    def read_alerts(self, eve_path):
+        """
+            Read the alerts of an eve.json log, once per signature and host.
+            :return: nothing - all alerts added to self.alerts
+        """
+        if not os.path.isfile(eve_path):
+            return
+
+        for event in EveReader(eve_path):
+            signature = event["alert"].get("signature", "")
+            host = event.get("dest_ip", "")
+            self.alerts.add("SNORT-01", "High", host,
+                            title_args=(signature,))
+
     def get_alerts(self):
-        return [dict(t) for t in {tuple(d.items()) for d in self.alerts}]
+        return self.alerts
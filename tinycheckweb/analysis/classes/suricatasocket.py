@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+import subprocess as sp
+import socket
+import fcntl
+import json
+import time
+import os
+
+
+class SuricataSocket(object):
+    """
+        Client of a long-lived suricata running in unix-socket mode. The
+        rules are loaded once by the daemon and the captures are submitted
+        with the pcap-file command, so each analysis skips suricata's
+        start-up and rule compilation.
+
+        The daemon reads the rules from a "current.rules" symlink next to
+        the cached rule files, switched and reloaded when the rules change.
+        The workers share that symlink and the daemon: each one holds the
+        rules lock from the switch of the symlink to the end of its capture,
+        so another worker can't reload other rules in the meantime.
+    """
+
+    PROTOCOL_VERSION = "0.2"
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.socket = None
+
+    @staticmethod
+    def rules_link(rules_file):
+        """
+            Get the path of the rules symlink read by the daemon.
+            :return: str
+        """
+        return os.path.join(os.path.dirname(rules_file), "current.rules")
+
+    @staticmethod
+    @contextmanager
+    def rules_lock(rules_file):
+        """
+            Hold the exclusive lock of the rules symlink.
+            :return: context manager.
+        """
+        path = os.path.join(os.path.dirname(rules_file), "current.rules.lock")
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @classmethod
+    def start_daemon(cls, path, rules_file):
+        """
+            Launch suricata in unix-socket mode on the given rule file.
+            :return: Popen of the daemon.
+        """
+        with cls.rules_lock(rules_file):
+            cls.link_rules(rules_file)
+        return sp.Popen(["suricata", "--unix-socket={}".format(path),
+                         "-S", cls.rules_link(rules_file)])
+
+    @classmethod
+    def link_rules(cls, rules_file):
+        """
+            Point the rules symlink to a rule file, the rules lock being held.
+            :return: bool - True if the symlink changed.
+        """
+        link = cls.rules_link(rules_file)
+        target = os.path.basename(rules_file)
+        if os.path.islink(link) and os.readlink(link) == target:
+            return False
+
+        tmp = "{}.{}".format(link, os.getpid())
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        os.symlink(target, tmp)
+        os.replace(tmp, link)
+        return True
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        """
+            Connect to the daemon and negotiate the protocol version.
+            :return: nothing, raises OSError if the daemon isn't reachable.
+        """
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(self.timeout)
+        self.socket.connect(self.path)
+        self.send({"version": self.PROTOCOL_VERSION})
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def send(self, message):
+        """
+            Send a message and read the JSON response.
+            :return: the "message" field of the response.
+        """
+        self.socket.sendall(json.dumps(message).encode())
+        data = b""
+        while True:
+            chunk = self.socket.recv(4096)
+            if not chunk:
+                raise OSError("Suricata closed the unix socket")
+            data += chunk
+            try:
+                response = json.loads(data)
+                break
+            except ValueError:
+                continue
+        if response.get("return") != "OK":
+            raise OSError("Suricata command failed: {}".format(response.get("message")))
+        return response.get("message")
+
+    def command(self, name, arguments=None):
+        """
+            Run a unix-socket command.
+            :return: the message of the response.
+        """
+        message = {"command": name}
+        if arguments is not None:
+            message["arguments"] = arguments
+        return self.send(message)
+
+    def load_rules(self, rules_file):
+        """
+            Make the daemon use a rule file, reloading its rules if needed.
+            The rules lock must be held until the captures are processed.
+            :return: nothing.
+        """
+        if self.link_rules(rules_file):
+            self.command("ruleset-reload-rules")
+
+    def pcap_file(self, pcap_path, output_dir, poll=0.2):
+        """
+            Submit a capture and wait for the daemon to process it.
+            :return: nothing.
+        """
+        pcap_path = os.path.abspath(pcap_path)
+        self.command("pcap-file", {"filename": pcap_path,
+                                   "output-dir": os.path.abspath(output_dir)})
+        while True:
+            queued = self.command("pcap-file-list")
+            if pcap_path not in queued.get("files", []) and self.command("pcap-current") != pcap_path:
+                return
+            time.sleep(poll)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from classes.iocindex import SuffixTrie, CIDRIndex
+from utils import get_whitelist
+
+
+class WhitelistMatcher(object):
+    """
+        Matcher built once from the whitelist table. Hosts are checked
+        with a set lookup, domains with a suffix trie and addresses with
+        a longest-prefix CIDR lookup, so the cost of a check doesn't
+        depend on the size of the whitelist.
+    """
+
+    def __init__(self):
+        self.hosts = set()
+        self.domains = set()
+        self.subdomains = SuffixTrie()
+        self.cidrs = CIDRIndex()
+        self.load()
+
+    def load(self):
+        """
+            Fill the matcher from the elements stored in the database.
+            :return: nothing.
+        """
+        self.hosts.update(get_whitelist("ip4addr") + get_whitelist("ip6addr"))
+        for domain in get_whitelist("domain"):
+            self.domains.add(domain)
+            self.subdomains.insert("." + domain, domain)
+        for cidr in get_whitelist("cidr"):
+            self.cidrs.insert(cidr, cidr)
+
+    def match_host(self, ip_addr):
+        """
+            Check if an IP address is whitelisted.
+            :return: bool
+        """
+        return ip_addr in self.hosts
+
+    def match_domain(self, domain):
+        """
+            Check if a domain name or one of its parents is whitelisted.
+            :return: bool
+        """
+        return domain in self.domains or self.subdomains.has_suffix(domain)
+
+    def match_cidr(self, ip_addr):
+        """
+            Check if an IP address belongs to a whitelisted network.
+            :return: bool
+        """
+        return self.cidrs.longest(ip_addr) is not None
+
+    def match(self, ip_addr, domain):
+        """
+            Check if a connection to an IP address resolved as domain
+            is whitelisted.
+            :return: bool
+        """
+        return self.match_host(ip_addr) or self.match_domain(domain) \
+            or self.match_cidr(ip_addr)
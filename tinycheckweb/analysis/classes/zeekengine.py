@@ -2,251 +2,347 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from classes.parsezeeklogs import ParseZeekLogs
-from netaddr import IPNetwork, IPAddress
-from utils import get_iocs, get_config, get_whitelist
+from classes.zeeklogreader import open_zeek_log, merge_zeek_logs
+from classes.pcapsharder import PcapSharder
+from classes.conncolumns import ConnColumns
+from classes.iocindex import IOCIndex
+from classes.whitelistmatcher import WhitelistMatcher
+from classes.enrichment import ActiveEnrichment
+from classes.publicsuffix import registrable_domain
+from classes.alertstore import Alert, AlertStore
+from utils import get_iocs, get_config_bool, get_config_int, get_config_list
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from bisect import bisect_right
 from datetime import datetime
 import subprocess as sp
-import json
-import pydig
+import shutil
 import os
-import re
-import sys
-import whois
+
+
+DNS_FIELDS = ["query", "qtype_name", "answers"]
+SSL_FIELDS = ["id.resp_h", "id.resp_p", "issuer", "validation_status"]
+FILES_FIELDS = ["filename", "tx_hosts", "rx_hosts", "mime_type", "sha1"]
+
+
+def index_dns(records, dns_index):
+    """
+        Index the A and AAAA resolutions of some dns.log records.
+        :return: dict - first domain seen for each answer.
+    """
+    for record in records:
+        if record is not None:
+            if record["qtype_name"] in ["A", "AAAA"]:
+                for answer in record["answers"].split(","):
+                    dns_index.setdefault(answer, record["query"])
+    return dns_index
+
+
+def distinct_certs(records, seen):
+    """
+        Get the certificates of some ssl.log records which aren't in seen.
+        :return: generator of certificates, seen being updated.
+    """
+    for record in records:
+        if record is not None:
+            c = {"host": record['id.resp_h'],
+                 "port": record['id.resp_p'],
+                 "issuer": record["issuer"],
+                 "validation_status": record["validation_status"]}
+            key = tuple(c.values())
+            if key not in seen:
+                seen.add(key)
+                yield c
+
+
+def distinct_files(records, seen):
+    """
+        Get the certificates of some files.log records which aren't in
+        seen, the only files checked for now.
+        :return: generator of files, seen being updated.
+    """
+    for record in records:
+        if record is not None and record["mime_type"] == "application/x-x509-ca-cert":
+            f = {"filename": record["filename"],
+                 "ip_src": record["tx_hosts"],
+                 "ip_dst": record["rx_hosts"],
+                 "mime_type": record["mime_type"],
+                 "sha1": record["sha1"]}
+            key = tuple(f.values())
+            if key not in seen:
+                seen.add(key)
+                yield f
+
+
+def read_dns(filepath):
+    """
+        Index the A and AAAA resolutions of a dns.log.
+        :return: dict - first domain seen for each answer.
+    """
+    dns_index = {}
+    if os.path.isfile(filepath):
+        index_dns(open_zeek_log(filepath, fields=DNS_FIELDS), dns_index)
+    return dns_index
+
+
+def read_conns(filepath):
+    """
+        Read the distinct connections of a conn.log.
+        :return: ConnColumns
+    """
+    columns = ConnColumns()
+    if os.path.isfile(filepath):
+        columns.load(filepath)
+    return columns
+
+
+def read_ssl(filepath):
+    """
+        Read the distinct certificates of a ssl.log.
+        :return: list of certificates.
+    """
+    ssl = []
+    if os.path.isfile(filepath):
+        ssl = list(distinct_certs(open_zeek_log(filepath, fields=SSL_FIELDS), set()))
+    return ssl
+
+
+def read_files(filepath):
+    """
+        Read the distinct certificates of a files.log, the only files
+        checked for now.
+        :return: list of files.
+    """
+    files = []
+    if os.path.isfile(filepath):
+        files = list(distinct_files(open_zeek_log(filepath, fields=FILES_FIELDS), set()))
+    return files
 
 
 class ZeekEngine(object):
 
-    def __init__(self, capture_directory):
+    def __init__(self, capture_directory, ioc_index=None, whitelist_matcher=None):
         self.working_dir = capture_directory
-        self.alerts = []
+        self.alerts = AlertStore()
         self.conns = []
         self.ssl = []
         self.http = []
-        self.dns = []
+        self.dns_index = {}
         self.files = []
-        self.whitelist = []
+        self.whitelist = {}
+
+        # Advices of the store, rebuilt at each alerts_check.
+        self.advices = []
+
+        # Distinct connections of the conn.log, stored by columns.
+        self.conn_columns = ConnColumns()
 
         # Get analysis and userlang configuration
-        self.heuristics_analysis = get_config(("analysis", "heuristics"))
-        self.iocs_analysis = get_config(("analysis", "iocs"))
-        self.whitelist_analysis = get_config(("analysis", "whitelist"))
-        self.active_analysis = get_config(("analysis", "active"))
-        self.userlang = get_config(("frontend", "user_lang"))
-
-        # Load template language
-        if not re.match("^[a-z]{2,3}$", self.userlang):
-            self.userlang = "en"
-        with open(os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), "locales/{}.json".format(self.userlang))) as f:
-            self.template = json.load(f)["alerts"]
-
-    def fill_dns(self, dir):
+        self.heuristics_analysis = get_config_bool(("analysis", "heuristics"))
+        self.iocs_analysis = get_config_bool(("analysis", "iocs"))
+        self.whitelist_analysis = get_config_bool(("analysis", "whitelist"))
+        self.active_analysis = get_config_bool(("analysis", "active"))
+
+        # Build the IOC index and the whitelist matcher shared by the checks,
+        # unless they are preloaded by the caller.
+        self.ioc_index = ioc_index
+        self.whitelist_matcher = whitelist_matcher
+        if self.whitelist_matcher is None and self.whitelist_analysis:
+            self.whitelist_matcher = WhitelistMatcher()
+
+    def parse_logs(self, dir):
         """
-            Fill the DNS resolutions thanks to the dns.log.
-            :return: nothing - all resolutions appended to self.dns.
+            Parse the dns, conn, ssl and files logs, each one in its own
+            process when zeek_parse_workers and the CPU count allow it and
+            the logs weigh zeek_parse_min_size bytes or more: below, the
+            start of the processes costs more than the parsing.
+            The checks, which correlate them, run once all of them are parsed.
+            :return: nothing.
         """
-        if os.path.isfile(os.path.join(dir, "dns.log")):
-            for record in ParseZeekLogs(os.path.join(dir, "dns.log"), output_format="json", safe_headers=False):
-                if record is not None:
-                    if record["qtype_name"] in ["A", "AAAA"]:
-                        d = {"domain": record["query"],
-                             "answers": record["answers"].split(",")}
-                        if d not in self.dns:
-                            self.dns.append(d)
-
-    def netflow_check(self, dir):
+        readers = [(read_dns, "dns.log"), (read_conns, "conn.log"),
+                   (read_ssl, "ssl.log"), (read_files, "files.log")]
+        workers = min(get_config_int(("analysis", "zeek_parse_workers"), 1), os.cpu_count() or 1)
+        if workers > 1:
+            paths = [os.path.join(dir, log) for _, log in readers]
+            size = sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+            if size < get_config_int(("analysis", "zeek_parse_min_size"), 0):
+                workers = 1
+
+        if workers > 1:
+            # Spawned, not forked: the caller can have threads running (the worker
+            # pool, the Flask app) whose locks a forked child would inherit.
+            with ProcessPoolExecutor(max_workers=min(workers, len(readers)),
+                                     mp_context=get_context("spawn")) as pool:
+                futures = [pool.submit(reader, os.path.join(dir, log)) for reader, log in readers]
+                results = [f.result() for f in futures]
+        else:
+            results = [reader(os.path.join(dir, log)) for reader, log in readers]
+
+        self.dns_index, self.conn_columns, self.ssl, self.files = results
+
+    def netflow_check(self):
         """
             Enrich and check the netflow from the conn.log against whitelist and IOCs.
             :return: nothing - all stuff appended to self.alerts
         """
-        max_ports = get_config(("analysis", "max_ports"))
-        http_default_port = get_config(("analysis", "http_default_port"))
-
-        # Get the netflow from conn.log.
-        if os.path.isfile(os.path.join(dir, "conn.log")):
-            for record in ParseZeekLogs(os.path.join(dir, "conn.log"), output_format="json", safe_headers=False):
-                if record is not None:
-                    c = {"ip_dst": record["id.resp_h"],
-                         "proto": record["proto"],
-                         "port_dst": record["id.resp_p"],
-                         "service": record["service"],
-                         "alert_tiggered": False}
-                    if c not in self.conns:
-                        self.conns.append(c)
-
-        # Let's add some dns resolutions.
-        for c in self.conns:
-            c["resolution"] = self.resolve(c["ip_dst"])
-
-        # Order the conns list by the resolution field.
-        self.conns = sorted(self.conns, key=lambda c: c["resolution"])
+        max_ports = get_config_int(("analysis", "max_ports"))
+        http_default_port = get_config_int(("analysis", "http_default_port"))
+        columns = self.conn_columns
+
+        # Let's add some dns resolutions, once per destination address.
+        resolutions = [self.resolve(ip) for ip in columns.addresses]
+        triggered = bytearray(len(columns))
+
+        def conn(row):
+            ip_dst, proto, port_dst, service = columns.get(row)
+            return {"ip_dst": ip_dst,
+                    "proto": proto,
+                    "port_dst": port_dst,
+                    "service": service,
+                    "alert_tiggered": bool(triggered[row]),
+                    "resolution": resolutions[columns.ip[row]]}
+
+        # Order the rows of the columns by the resolution field. The checks
+        # work on the rows, the conns dicts are built for the output only.
+        rows = sorted(range(len(columns)), key=lambda row: resolutions[columns.ip[row]])
 
         # Check for whitelisted assets, if any, delete the record.
         if self.whitelist_analysis:
+            whitelisted = [self.whitelist_matcher.match(ip, resolution)
+                           for ip, resolution in zip(columns.addresses, resolutions)]
 
-            wl_cidrs = [IPNetwork(cidr) for cidr in get_whitelist("cidr")]
-            wl_hosts = get_whitelist("ip4addr") + get_whitelist("ip6addr")
-            wl_domains = get_whitelist("domain")
-
-            for i, c in enumerate(self.conns):
-                if c["ip_dst"] in [ip for ip in wl_hosts]:
-                    self.whitelist.append(self.conns[i])
-                    self.conns[i] = False
-                elif c["resolution"] in wl_domains:
-                    self.whitelist.append(self.conns[i])
-                    self.conns[i] = False
-                elif True in [c["resolution"].endswith("." + dom) for dom in wl_domains]:
-                    self.whitelist.append(self.conns[i])
-                    self.conns[i] = False
-                elif True in [IPAddress(c["ip_dst"]) in cidr for cidr in wl_cidrs]:
-                    self.whitelist.append(self.conns[i])
-                    self.conns[i] = False
+            for row in rows:
+                if whitelisted[columns.ip[row]]:
+                    c = conn(row)
+                    self.whitelist.setdefault(tuple(c.items()), c)
 
             # Let's delete whitelisted connections.
-            self.conns = list(filter(lambda c: c != False, self.conns))
+            rows = [row for row in rows if not whitelisted[columns.ip[row]]]
 
         if self.heuristics_analysis:
-            for c in self.conns:
+            udp_icmp = columns.mask("proto", lambda p: p in ["UDP", "ICMP"])
+            high_ports = columns.mask("port", lambda p: p >= max_ports)
+            http = columns.mask("service", lambda s: s == "http")
+            http_default = columns.mask("port", lambda p: p == http_default_port)
+            unresolved = columns.mask("ip", lambda ip: self.resolve(ip) == ip)
+
+            for row in rows:
+                ip_dst, proto, port_dst, _ = columns.get(row)
+                resolution = resolutions[columns.ip[row]]
                 # Check for UDP / ICMP (strange from a smartphone.)
-                if c["proto"] in ["UDP", "ICMP"]:
-                    c["alert_tiggered"] = True
-                    self.alerts.append({"title": self.template["PROTO-01"]["title"].format(c["proto"].upper(), c["resolution"]),
-                                        "description": self.template["PROTO-01"]["description"].format(c["proto"].upper(), c["resolution"]),
-                                        "host":  c["resolution"],
-                                        "level": "Moderate",
-                                        "id": "PROTO-01"})
+                if udp_icmp[row]:
+                    triggered[row] = True
+                    self.alerts.add("PROTO-01", "Moderate", resolution,
+                                    title_args=(proto.upper(), resolution),
+                                    description_args=(proto.upper(), resolution))
                 # Check for use of ports over 1024.
-                if c["port_dst"] >= max_ports:
-                    c["alert_tiggered"] = True
-                    self.alerts.append({"title": self.template["PROTO-02"]["title"].format(c["proto"].upper(), c["resolution"], max_ports),
-                                        "description": self.template["PROTO-02"]["description"].format(c["proto"].upper(), c["resolution"], c["port_dst"]),
-                                        "host":  c["resolution"],
-                                        "level": "Low",
-                                        "id": "PROTO-02"})
+                if high_ports[row]:
+                    triggered[row] = True
+                    self.alerts.add("PROTO-02", "Low", resolution,
+                                    title_args=(proto.upper(), resolution, max_ports),
+                                    description_args=(proto.upper(), resolution, port_dst))
                 # Check for use of HTTP.
-                if c["service"] == "http" and c["port_dst"] == http_default_port:
-                    c["alert_tiggered"] = True
-                    self.alerts.append({"title": self.template["PROTO-03"]["title"].format(c["resolution"]),
-                                        "description": self.template["PROTO-03"]["description"].format(c["resolution"]),
-                                        "host":  c["resolution"],
-                                        "level": "Low",
-                                        "id": "PROTO-03"})
+                if http[row] and http_default[row]:
+                    triggered[row] = True
+                    self.alerts.add("PROTO-03", "Low", resolution,
+                                    title_args=(resolution,),
+                                    description_args=(resolution,))
 
                 # Check for use of HTTP on a non standard port.
-                if c["service"] == "http" and c["port_dst"] != http_default_port:
-                    c["alert_tiggered"] = True
-                    self.alerts.append({"title": self.template["PROTO-04"]["title"].format(c["resolution"], c["port_dst"]),
-                                        "description": self.template["PROTO-04"]["description"].format(c["resolution"], c["port_dst"]),
-                                        "host":  c["resolution"],
-                                        "level": "Moderate",
-                                        "id": "PROTO-04"})
+                if http[row] and not http_default[row]:
+                    triggered[row] = True
+                    self.alerts.add("PROTO-04", "Moderate", resolution,
+                                    title_args=(resolution, port_dst),
+                                    description_args=(resolution, port_dst))
                 # Check for non-resolved IP address.
-                if c["ip_dst"] == c["resolution"]:
-                    c["alert_tiggered"] = True
-                    self.alerts.append({"title": self.template["PROTO-05"]["title"].format(c["ip_dst"]),
-                                        "description": self.template["PROTO-05"]["description"].format(c["ip_dst"]),
-                                        "host": c["ip_dst"],
-                                        "level": "Low",
-                                        "id": "PROTO-05"})
+                if unresolved[row]:
+                    triggered[row] = True
+                    self.alerts.add("PROTO-05", "Low", ip_dst,
+                                    title_args=(ip_dst,),
+                                    description_args=(ip_dst,))
 
         if self.iocs_analysis:
 
-            bl_cidrs = [[IPNetwork(cidr[0]), cidr[1]]
-                        for cidr in get_iocs("cidr")]
-            bl_hosts = get_iocs("ip4addr") + get_iocs("ip6addr")
-            bl_domains = get_iocs("domain")
-            bl_freedns = get_iocs("freedns")
-            bl_nameservers = get_iocs("ns")
-            bl_tlds = get_iocs("tld")
+            if self.ioc_index is None:
+                self.ioc_index = IOCIndex()
+            ioc_index = self.ioc_index
 
-            for c in self.conns:
+            # Match each distinct address once against hosts and CIDRs.
+            bl_hosts = [ioc_index.match_host(ip) for ip in columns.addresses]
+            bl_cidrs = [ioc_index.match_cidrs(ip) for ip in columns.addresses]
+
+            for row in rows:
+                ip_dst = columns.addresses.values[columns.ip[row]]
+                resolution = resolutions[columns.ip[row]]
                 # Check for blacklisted IP address.
-                for host in bl_hosts:
-                    if c["ip_dst"] == host[0]:
-                        c["alert_tiggered"] = True
-                        self.alerts.append({"title": self.template["IOC-01"]["title"].format(c["resolution"], c["ip_dst"], host[1].upper()),
-                                            "description": self.template["IOC-01"]["description"].format(c["ip_dst"]),
-                                            "host": c["resolution"],
-                                            "level": "High",
-                                            "id": "IOC-01"})
-                        break
+                host = bl_hosts[columns.ip[row]]
+                if host is not None:
+                    triggered[row] = True
+                    self.alerts.add("IOC-01", "High", resolution,
+                                    title_args=(resolution, ip_dst, host[1].upper()),
+                                    description_args=(ip_dst,))
                 # Check for blacklisted CIDR.
-                for cidr in bl_cidrs:
-                    if IPAddress(c["ip_dst"]) in cidr[0]:
-                        c["alert_tiggered"] = True
-                        self.alerts.append({"title": self.template["IOC-02"]["title"].format(c["resolution"], cidr[0], cidr[1].upper()),
-                                            "description": self.template["IOC-02"]["description"].format(c["resolution"]),
-                                            "host": c["resolution"],
-                                            "level": "Moderate",
-                                            "id": "IOC-02"})
+                for cidr in bl_cidrs[columns.ip[row]]:
+                    triggered[row] = True
+                    self.alerts.add("IOC-02", "Moderate", resolution,
+                                    title_args=(resolution, cidr[0], cidr[1].upper()),
+                                    description_args=(resolution,))
                 # Check for blacklisted domain.
-                for domain in bl_domains:
-                    if c["resolution"].endswith(domain[0]):
-                        if domain[1] != "tracker":
-                            c["alert_tiggered"] = True
-                            self.alerts.append({"title": self.template["IOC-03"]["title"].format(c["resolution"], domain[1].upper()),
-                                                "description": self.template["IOC-03"]["description"].format(c["resolution"]),
-                                                "host": c["resolution"],
-                                                "level": "High",
-                                                "id": "IOC-03"})
-                        else:
-                            c["alert_tiggered"] = True
-                            self.alerts.append({"title": self.template["IOC-04"]["title"].format(c["resolution"], domain[1].upper()),
-                                                "description": self.template["IOC-04"]["description"].format(c["resolution"]),
-                                                "host": c["resolution"],
-                                                "level": "Moderate",
-                                                "id": "IOC-04"})
+                for domain in ioc_index.match_domains(resolution):
+                    if domain[1] != "tracker":
+                        triggered[row] = True
+                        self.alerts.add("IOC-03", "High", resolution,
+                                        title_args=(resolution, domain[1].upper()),
+                                        description_args=(resolution,))
+                    else:
+                        triggered[row] = True
+                        self.alerts.add("IOC-04", "Moderate", resolution,
+                                        title_args=(resolution, domain[1].upper()),
+                                        description_args=(resolution,))
                 # Check for blacklisted FreeDNS.
-                for domain in bl_freedns:
-                    if c["resolution"].endswith("." + domain[0]):
-                        c["alert_tiggered"] = True
-                        self.alerts.append({"title": self.template["IOC-05"]["title"].format(c["resolution"]),
-                                            "description": self.template["IOC-05"]["description"].format(c["resolution"]),
-                                            "host": c["resolution"],
-                                            "level": "Moderate",
-                                            "id": "IOC-05"})
+                for domain in ioc_index.match_freedns(resolution):
+                    triggered[row] = True
+                    self.alerts.add("IOC-05", "Moderate", resolution,
+                                    title_args=(resolution,),
+                                    description_args=(resolution,))
 
                 # Check for suspect tlds.
-                for tld in bl_tlds:
-                    if c["resolution"].endswith(tld[0]):
-                        c["alert_tiggered"] = True
-                        self.alerts.append({"title": self.template["IOC-06"]["title"].format(c["resolution"]),
-                                            "description": self.template["IOC-06"]["description"].format(c["resolution"], tld[0]),
-                                            "host": c["resolution"],
-                                            "level": "Low",
-                                            "id": "IOC-06"})
+                for tld in ioc_index.match_tlds(resolution):
+                    triggered[row] = True
+                    self.alerts.add("IOC-06", "Low", resolution,
+                                    title_args=(resolution,),
+                                    description_args=(resolution, tld[0]))
+
+        conns = [conn(row) for row in rows]
+        self.conns += conns
+
         if self.active_analysis:
-            for c in self.conns:
-                try:  # Domain nameservers check.
-                    name_servers = pydig.query(c["resolution"], "NS")
-                    if len(name_servers):
-                        for ns in bl_nameservers:
-                            if name_servers[0].endswith(".{}.".format(ns[0])):
-                                c["alert_tiggered"] = True
-                                self.alerts.append({"title": self.template["ACT-01"]["title"].format(c["resolution"], name_servers[0]),
-                                                    "description": self.template["ACT-01"]["description"].format(c["resolution"]),
-                                                    "host": c["resolution"],
-                                                    "level": "Moderate",
-                                                    "id": "ACT-01"})
-                except:
-                    pass
+            # Look up each registrable domain once and fan the results out.
+            domains = {c["resolution"]: registrable_domain(c["resolution"]) for c in conns}
+            enrichment = ActiveEnrichment().enrich(domains.values())
+            for c in conns:
+                record = enrichment[domains[c["resolution"]]]
+
+                # Domain nameservers check.
+                name_servers = record["ns"]
+                if self.iocs_analysis and name_servers:
+                    for ns in ioc_index.match_nameservers(name_servers[0]):
+                        c["alert_tiggered"] = True
+                        self.alerts.add("ACT-01", "Moderate", c["resolution"],
+                                        title_args=(c["resolution"], name_servers[0]),
+                                        description_args=(c["resolution"],))
 
                 try:  # Domain history check.
-                    whois_record = whois.whois(c["resolution"])
-                    creation_date = whois_record.creation_date if type(
-                        whois_record.creation_date) is not list else whois_record.creation_date[0]
-                    creation_days = abs((datetime.now() - creation_date).days)
+                    creation_days = abs((datetime.now() - record["creation_date"]).days)
                     if creation_days < 365:
                         c["alert_tiggered"] = True
-                        self.alerts.append({"title": self.template["ACT-02"]["title"].format(c["resolution"], creation_days),
-                                            "description": self.template["ACT-02"]["description"].format(c["resolution"]),
-                                            "host": c["resolution"],
-                                            "level": "Moderate",
-                                            "id": "ACT-02"})
+                        self.alerts.add("ACT-02", "Moderate", c["resolution"],
+                                        title_args=(c["resolution"], creation_days),
+                                        description_args=(c["resolution"],))
                 except:
                     pass
 
-    def files_check(self, dir):
+    def files_check(self):
         """
             Check on the files.log:
                 * Check certificates sha1
@@ -259,30 +355,16 @@ class ZeekEngine(object):
 
         bl_certs = get_iocs("sha1cert")
 
-        if os.path.isfile(os.path.join(dir, "files.log")):
-            for record in ParseZeekLogs(os.path.join(dir, "files.log"), output_format="json", safe_headers=False):
-                if record is not None:
-                    f = {"filename": record["filename"],
-                         "ip_src": record["tx_hosts"],
-                         "ip_dst": record["rx_hosts"],
-                         "mime_type": record["mime_type"],
-                         "sha1": record["sha1"]}
-                    if f not in self.files:
-                        self.files.append(f)
-
         for f in self.files:
             if f["mime_type"] == "application/x-x509-ca-cert":
                 for cert in bl_certs:  # Check for blacklisted certificate.
                     if f["sha1"] == cert[0]:
                         host = self.resolve(f["ip_dst"])
-                        c["alert_tiggered"] = True
-                        self.alerts.append({"title": self.template["IOC-07"]["title"].format(cert[1].upper(), host),
-                                            "description": self.template["IOC-07"]["description"].format(f["sha1"], host),
-                                            "host": host,
-                                            "level": "High",
-                                            "id": "IOC-07"})
+                        self.alerts.add("IOC-07", "High", host,
+                                        title_args=(cert[1].upper(), host),
+                                        description_args=(f["sha1"], host))
 
-    def ssl_check(self, dir):
+    def ssl_check(self):
         """
             Check on the ssl.log:
                 * SSL connections which doesn't use the 443.
@@ -290,71 +372,91 @@ class ZeekEngine(object):
                 * Self-signed certificates.
             :return: nothing - all stuff appended to self.alerts
         """
-        ssl_default_ports = get_config(("analysis", "ssl_default_ports"))
-        free_issuers = get_config(("analysis", "free_issuers"))
-
-        if os.path.isfile(os.path.join(dir, "ssl.log")):
-            for record in ParseZeekLogs(os.path.join(dir, "ssl.log"), output_format="json", safe_headers=False):
-                if record is not None:
-                    c = {"host": record['id.resp_h'],
-                         "port": record['id.resp_p'],
-                         "issuer": record["issuer"],
-                         "validation_status": record["validation_status"]}
-                    if c not in self.ssl:
-                        self.ssl.append(c)
+        ssl_default_ports = get_config_list(("analysis", "ssl_default_ports"))
+        free_issuers = get_config_list(("analysis", "free_issuers"))
+        substring_match = get_config_bool(("analysis", "ssl_substring_match"))
 
         if self.heuristics_analysis:
+            # Index the conns by resolution. The conns to the address of a
+            # certificate share its resolution, so they are indexed too.
+            resolutions = {}
+            for c in self.conns:
+                resolutions.setdefault(c["resolution"], []).append(c)
+
+            # With ssl_substring_match, a certificate also matches the conns
+            # whose resolution contains its host, e.g. its subdomains. The
+            # resolutions are joined to look for the host in a single pass.
+            if substring_match:
+                keys = list(resolutions)
+                text = "\n".join(keys)
+                starts = [0]
+                for r in keys[:-1]:
+                    starts.append(starts[-1] + len(r) + 1)
+
+            matches = {}
             for cert in self.ssl:
                 host = self.resolve(cert["host"])
 
                 # If the associated host has not whitelisted, check the cert.
-                for c in self.conns:
-                    if host in c["resolution"]:
-                        # Check for non generic SSL port.
-                        if cert["port"] not in ssl_default_ports:
-                            c["alert_tiggered"] = True
-                            self.alerts.append({"title": self.template["SSL-01"]["title"].format(cert["port"], host),
-                                                "description": self.template["SSL-01"]["description"].format(host),
-                                                "host": host,
-                                                "level": "Moderate",
-                                                "id": "SSL-01"})
-                        # Check Free SSL certificates.
-                        if cert["issuer"] in free_issuers:
-                            c["alert_tiggered"] = True
-                            self.alerts.append({"title": self.template["SSL-02"]["title"].format(host),
-                                                "description": self.template["SSL-02"]["description"],
-                                                "host": host,
-                                                "level": "Moderate",
-                                                "id": "SSL-02"})
-                        # Check for self-signed certificates.
-                        if cert["validation_status"] == "self signed certificate in certificate chain":
-                            c["alert_tiggered"] = True
-                            self.alerts.append({"title": self.template["SSL-03"]["title"].format(host),
-                                                "description": self.template["SSL-03"]["description"].format(host),
-                                                "host": host,
-                                                "level": "Moderate",
-                                                "id": "SSL-03"})
+                if host not in matches:
+                    if substring_match:
+                        matches[host] = []
+                        pos = text.find(host)
+                        while pos != -1:
+                            i = bisect_right(starts, pos) - 1
+                            matches[host] += resolutions[keys[i]]
+                            pos = text.find(host, starts[i + 1]) if i + 1 < len(starts) else -1
+                    else:
+                        matches[host] = resolutions.get(host, [])
+                conns = matches[host]
+                if not conns:
+                    continue
+
+                # Check for non generic SSL port.
+                if cert["port"] not in ssl_default_ports:
+                    self.ssl_alert(conns, "SSL-01", "Moderate", host,
+                                   title_args=(cert["port"], host),
+                                   description_args=(host,))
+                # Check Free SSL certificates.
+                if cert["issuer"] in free_issuers:
+                    self.ssl_alert(conns, "SSL-02", "Moderate", host,
+                                   title_args=(host,))
+                # Check for self-signed certificates.
+                if cert["validation_status"] == "self signed certificate in certificate chain":
+                    self.ssl_alert(conns, "SSL-03", "Moderate", host,
+                                   title_args=(host,),
+                                   description_args=(host,))
+
+    def ssl_alert(self, conns, alert_id, level, host, title_args=(), description_args=()):
+        """
+            Raise an alert of a certificate and flag its conns.
+            :return: nothing - the alert is added to self.alerts
+        """
+        for c in conns:
+            c["alert_tiggered"] = True
+        self.alerts.add(alert_id, level, host, title_args, description_args)
 
     def alerts_check(self):
         """
             Leverage an advice to the user based on the trigered hosts
             :return: nothing - all generated alerts appended to self.alerts
         """
-        hosts = {}
-
-        for alert in [dict(t) for t in {tuple(d.items()) for d in self.alerts}]:
-            if alert["host"] not in hosts:
-                hosts[alert["host"]] = 1
-            else:
-                hosts[alert["host"]] += 1
-
-        for host, nb in hosts.items():
-            if nb >= get_config(("analysis", "max_alerts")):
-                self.alerts.append({"title": self.template["ADV-01"]["title"].format(host),
-                                    "description": self.template["ADV-01"]["description"].format(host, nb),
-                                    "host": host,
-                                    "level": "Moderate",
-                                    "id": "ADV-01"})
+        max_alerts = get_config_int(("analysis", "max_alerts"))
+
+        # The live analysis checks again as alerts are added: the previous
+        # advices are replaced, so they stay last and count the current alerts.
+        for alert in self.advices:
+            self.alerts.remove(alert)
+        self.advices = []
+
+        # Go over a copy of the counters, the advices being counted too.
+        for host, nb in list(self.alerts.hosts.items()):
+            if nb >= max_alerts:
+                alert = Alert("ADV-01", "Moderate", host,
+                              title_args=(host,),
+                              description_args=(host, nb))
+                self.alerts.insert(alert)
+                self.advices.append(alert)
 
     def resolve(self, ip_addr):
         """
@@ -363,39 +465,67 @@ class ZeekEngine(object):
 
             :return: String - DNS record or IP Address.
         """
-        for record in self.dns:
-            if ip_addr in record["answers"]:
-                return record["domain"]
-        return ip_addr
+        return self.dns_index.get(ip_addr, ip_addr)
+
+    def run_zeek(self, directories):
+        """
+            Run zeek against the capture.pcap of some directories in parallel.
+            :return: nothing.
+        """
+        json_logs = "LogAscii::use_json=T" if get_config_bool(("analysis", "zeek_json")) else ""
+        processes = [sp.Popen("cd {} && /opt/zeek/bin/zeek -Cr capture.pcap protocols/ssl/validate-certs {}".format(
+            d, json_logs), shell=True) for d in directories]
+        for process in processes:
+            process.wait()
+
+    def run_zeek_shards(self, shards):
+        """
+            Split the capture into flow-consistent shards, run zeek on each
+            of them in parallel and merge their logs into the assets.
+            :return: nothing.
+        """
+        shards_dir = os.path.join(self.working_dir, "shards")
+        directories = PcapSharder(os.path.join(self.working_dir, "capture.pcap")).split(shards_dir, shards)
+        self.run_zeek(directories)
+
+        logs = {l for d in directories for l in os.listdir(d) if l.endswith(".log")}
+        for log in logs:
+            merge_zeek_logs([os.path.join(d, log) for d in directories if os.path.isfile(os.path.join(d, log))],
+                            os.path.join(self.working_dir, "assets", log))
+        shutil.rmtree(shards_dir)
 
     def start_zeek(self):
         """
-            Start zeek and check the logs.
+            Start zeek and check the logs. Captures bigger than
+            zeek_shard_min_size are split in zeek_shards shards.
         """
-        sp.Popen("cd {} && /opt/zeek/bin/zeek -Cr capture.pcap protocols/ssl/validate-certs".format(
-            self.working_dir), shell=True).wait()
-        sp.Popen("cd {} && mv *.log assets/".format(self.working_dir),
-                 shell=True).wait()
-
-        self.fill_dns(self.working_dir + "/assets/")
-        self.netflow_check(self.working_dir + "/assets/")
-        self.ssl_check(self.working_dir + "/assets/")
-        self.files_check(self.working_dir + "/assets/")
+        shards = get_config_int(("analysis", "zeek_shards"), 1)
+        if shards > 1 and os.path.getsize(os.path.join(self.working_dir, "capture.pcap")) >= get_config_int(("analysis", "zeek_shard_min_size")):
+            self.run_zeek_shards(shards)
+        else:
+            self.run_zeek([self.working_dir])
+            sp.Popen("cd {} && mv *.log assets/".format(self.working_dir),
+                     shell=True).wait()
+
+        self.parse_logs(self.working_dir + "/assets/")
+        self.netflow_check()
+        self.ssl_check()
+        self.files_check()
         self.alerts_check()
 
     def retrieve_alerts(self):
         """
             Retrieve alerts.
-            :return: list - a list of alerts wihout duplicates.
+            :return: AlertStore - the alerts, without duplicates.
         """
-        return [dict(t) for t in {tuple(d.items()) for d in self.alerts}]
+        return self.alerts
 
     def retrieve_whitelist(self):
         """
             Retrieve whitelisted elements.
             :return: list - a list of whitelisted elements wihout duplicates.
         """
-        return [dict(t) for t in {tuple(d.items()) for d in self.whitelist}]
+        return list(self.whitelist.values())
 
     def retrieve_conns(self):
         """
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from collections import namedtuple
+from operator import itemgetter
+from itertools import chain
+import heapq
+import os
+
+# Use the fastest JSON decoder available.
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+
+def open_zeek_log(filepath, fields=None):
+    """
+        Open a Zeek log written either by the TSV or the JSON writer,
+        by sniffing its first character.
+        :return: ZeekLogReader or ZeekJsonLogReader
+    """
+    with open(filepath, "rb") as f:
+        first = f.read(1)
+    if first == b"{":
+        return ZeekJsonLogReader(filepath, fields=fields)
+    return ZeekLogReader(filepath, fields=fields)
+
+
+class ZeekLogReader(object):
+    """
+        Streaming reader of Zeek TSV logs. The header is compiled once into
+        the indexes and converters of the selected columns, so each line is
+        only split and converted, without any per-field lookup.
+
+        Records have the same content as the ones of ParseZeekLogs with
+        output_format="json": unset values become "" and unset numeric
+        values are dropped (or set to None in namedtuples).
+    """
+
+    CONVERTERS = {"port": int, "count": int,
+                  "double": float, "interval": float,
+                  "bool": bool}
+
+    def __init__(self, filepath, fields=None, output_format="dict", safe_headers=False):
+        self.fd = open(filepath, "r")
+        self.filtered_fields = fields
+        self.output_format = output_format
+        self.safe_headers = safe_headers
+        self.options = {}
+
+        # Read the header option lines
+        l = self.fd.readline()
+        while l.strip().startswith("#"):
+            l = l.strip()
+            if l.startswith("#separator"):
+                self.options["separator"] = str.encode(
+                    l[1:].split(" ")[1].strip()).decode("unicode_escape")
+            else:
+                key, *value = l[1:].split(self.options.get("separator"))
+                self.options[key] = value
+            l = self.fd.readline()
+        self.firstLine = l
+
+        self.separator = self.options.get("separator")
+        self.fields = self.options.get("fields")
+        self.types = self.options.get("types")
+        if self.safe_headers is True:
+            self.fields = [f.replace(".", "_") for f in self.fields]
+
+        self.compile()
+
+    def compile(self):
+        """
+            Compile the header into the tuple of selected columns.
+            :return: nothing.
+        """
+        columns = [(i, f, self.CONVERTERS.get(self.types[i]))
+                   for i, f in enumerate(self.fields)
+                   if self.filtered_fields is None or f in self.filtered_fields]
+
+        self.indexes = tuple(c[0] for c in columns)
+        self.names = tuple(c[1] for c in columns)
+        self.converters = tuple(c[2] for c in columns)
+
+        if self.output_format == "namedtuple":
+            self.record_type = namedtuple("ZeekRecord", [n.replace(".", "_") for n in self.names],
+                                          rename=True)
+
+    def __del__(self):
+        if hasattr(self, "fd"):
+            self.fd.close()
+
+    def __iter__(self):
+        nb_fields = len(self.fields)
+        separator = self.separator
+        indexes = self.indexes
+        columns = tuple(zip(self.names, self.converters, indexes))
+        as_tuple = self.output_format == "namedtuple"
+        make = self.record_type._make if as_tuple else None
+        convert_value = self.convert
+
+        for line in chain([self.firstLine], self.fd):
+            line = line.strip()
+
+            # An empty line means that we are done reading
+            if line == "":
+                return
+
+            values = line.split(separator)
+            if len(values) != nb_fields or values[0].startswith("#"):
+                continue
+
+            if as_tuple:
+                yield make([convert_value(values[i], convert, None)
+                            for _, convert, i in columns])
+                continue
+
+            record = {}
+            for name, convert, i in columns:
+                value = values[i]
+                if value == "-":
+                    value = ""
+                if convert is None:
+                    record[name] = value
+                elif value != "" or convert is bool:
+                    record[name] = convert(value)
+            yield record
+
+    @staticmethod
+    def convert(value, convert, default):
+        """
+            Convert a single value according to its column converter.
+            :return: converted value or default for unset numbers.
+        """
+        if value == "-":
+            value = ""
+        if convert is None:
+            return value
+        if value == "" and convert is not bool:
+            return default
+        return convert(value)
+
+    def get_fields(self):
+        """
+            Get the names of the selected columns.
+            :return: list of field names.
+        """
+        return list(self.names)
+
+
+class ZeekJsonLogReader(object):
+    """
+        Streaming reader of Zeek logs written with LogAscii::use_json=T.
+        Lines are decoded one at a time and the records are shaped like
+        the ones of ZeekLogReader: unset fields become "" and sets or
+        vectors are joined with ",", "(empty)" standing for empty ones.
+    """
+
+    def __init__(self, filepath, fields=None):
+        self.fd = open(filepath, "rb")
+        self.filtered_fields = fields
+
+    def __del__(self):
+        if hasattr(self, "fd"):
+            self.fd.close()
+
+    @staticmethod
+    def normalize(value):
+        """
+            Convert a JSON value to its TSV reader counterpart.
+            :return: converted value.
+        """
+        if isinstance(value, list):
+            return ",".join(str(v) for v in value) if len(value) else "(empty)"
+        return value
+
+    def __iter__(self):
+        fields = self.filtered_fields
+        normalize = self.normalize
+
+        for line in self.fd:
+            if not line.strip():
+                continue
+            record = loads(line)
+            if fields is None:
+                yield {k: normalize(v) for k, v in record.items()}
+            else:
+                yield {f: normalize(record.get(f, "")) for f in fields}
+
+
+class ZeekLogTailer(object):
+    """
+        Follower of a Zeek log still being written, for the live analysis.
+        Each iteration yields the records appended since the previous one,
+        shaped like the ones of ZeekLogReader and ZeekJsonLogReader, and
+        keeps the last line until it is complete.
+
+        When Zeek rotates the log (renames it and starts a new one), the
+        end of the previous file is read before following the new one.
+    """
+
+    def __init__(self, filepath, fields=None):
+        self.filepath = filepath
+        self.filtered_fields = fields
+        self.fd = None
+        self.inode = None
+        self.buffer = b""
+        self.separator = None
+        self.fields = None
+        self.columns = None
+
+    def __del__(self):
+        if self.fd is not None:
+            self.fd.close()
+
+    def open(self):
+        """
+            Open the log, if it exists, and forget the previous header.
+            :return: bool - True if the log is opened.
+        """
+        try:
+            fd = open(self.filepath, "rb")
+        except FileNotFoundError:
+            return False
+        if self.fd is not None:
+            self.fd.close()
+        self.fd, self.inode, self.buffer = fd, os.fstat(fd.fileno()).st_ino, b""
+        self.separator, self.fields, self.columns = None, None, None
+        return True
+
+    def rotated(self):
+        """
+            Check if the log path now leads to a new file, or if the file
+            has been truncated.
+            :return: bool
+        """
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return False
+        return stat.st_ino != self.inode or stat.st_size < self.fd.tell()
+
+    def __iter__(self):
+        if self.fd is None and not self.open():
+            return
+        while True:
+            data = self.fd.read()
+            if data:
+                lines = (self.buffer + data).split(b"\n")
+                self.buffer = lines.pop()
+                for line in lines:
+                    record = self.parse(line.decode("utf-8", "replace").strip())
+                    if record is not None:
+                        yield record
+            if not self.rotated() or not self.open():
+                return
+
+    def parse(self, line):
+        """
+            Parse a line of the log, header lines updating the columns.
+            :return: dict or None if the line isn't a record.
+        """
+        if line == "":
+            return None
+        if line.startswith("{"):
+            record, normalize = loads(line), ZeekJsonLogReader.normalize
+            if self.filtered_fields is None:
+                return {k: normalize(v) for k, v in record.items()}
+            return {f: normalize(record.get(f, "")) for f in self.filtered_fields}
+        if line.startswith("#"):
+            self.header(line)
+            return None
+        if self.columns is None:
+            return None
+
+        values = line.split(self.separator)
+        if len(values) != len(self.fields):
+            return None
+        record = {}
+        for name, convert, i in self.columns:
+            value = values[i]
+            if value == "-":
+                value = ""
+            if convert is None:
+                record[name] = value
+            elif value != "" or convert is bool:
+                record[name] = convert(value)
+        return record
+
+    def header(self, line):
+        """
+            Read a header line, compiling the columns once the fields
+            and their types are known.
+            :return: nothing.
+        """
+        if line.startswith("#separator"):
+            self.separator = line.split(" ")[1].strip().encode().decode("unicode_escape")
+            return
+        key, *value = line[1:].split(self.separator)
+        if key == "fields":
+            self.fields = value
+        elif key == "types" and self.fields is not None:
+            self.columns = [(f, ZeekLogReader.CONVERTERS.get(value[i]), i)
+                            for i, f in enumerate(self.fields)
+                            if self.filtered_fields is None or f in self.filtered_fields]
+
+
+def merge_zeek_logs(filepaths, output):
+    """
+        Merge logs of the same type written by several Zeek instances,
+        streamed through a k-way merge on their timestamps without being
+        loaded. Zeek writes a record when it ends, so like the log of a
+        single instance the output is only nearly sorted by ts. TSV logs
+        keep the header of the first log and the last #close line. Logs
+        without any ts field are concatenated.
+        :return: nothing.
+    """
+    files, streams, header, closes = [], [], [], []
+    try:
+        for filepath in filepaths:
+            f = open(filepath, "r")
+            files.append(f)
+            lines, first = [], f.readline()
+            while first.startswith("#"):
+                lines.append(first)
+                first = f.readline()
+            header = header or [l for l in lines if not l.startswith("#close")]
+            closes.append([])
+            streams.append(zeek_log_records(f, first, lines, closes[-1]))
+
+        if all(key is not None for key, _ in streams):
+            records = heapq.merge(*(r for _, r in streams), key=itemgetter(0))
+        else:
+            records = chain.from_iterable(r for _, r in streams)
+        with open(output, "w") as f:
+            f.writelines(header)
+            f.writelines(line for _, line in records)
+            f.writelines(next((c for c in reversed(closes) if c), []))
+    finally:
+        for f in files:
+            f.close()
+
+
+def zeek_log_records(f, first, header, close):
+    """
+        Stream the records of a log opened by merge_zeek_logs, from its
+        first line after the header, keyed by their timestamp. The #close
+        lines are collected into close.
+        :return: (key or None if the log has no ts field, generator of (ts, line))
+    """
+    if first.startswith("{"):
+        key = lambda line: loads(line).get("ts", 0)
+    else:
+        separator, names = "\t", []
+        for line in header:
+            if line.startswith("#separator"):
+                separator = line.split(" ")[1].strip().encode().decode("unicode_escape")
+            elif line.startswith("#fields"):
+                names = line.rstrip("\n").split(separator)[1:]
+        ts = names.index("ts") if "ts" in names else None
+        key = None if ts is None else lambda line: float(line.split(separator, ts + 1)[ts])
+
+    def records():
+        for line in chain([first], f):
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                if line.startswith("#close"):
+                    close.append(line)
+                continue
+            yield (key(line) if key is not None else 0), line
+    return key, records()
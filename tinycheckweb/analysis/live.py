@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from classes.livezeekengine import LiveZeekEngine
+from classes.suricataengine import SuricataEngine
+from classes.whitelistmatcher import WhitelistMatcher
+from classes.pcapreplayer import PcapReplayer
+from analysis import write_json, write_alerts, write_report
+from utils import get_config_bool, get_tables_version, render_alert
+from threading import Event, Thread
+import subprocess as sp
+import argparse
+import signal
+import time
+import sys
+import os
+sys.path.append(os.path.abspath('./'))
+from run import return_app
+from tinycheckweb import db
+
+"""
+    Live analysis of a capture still being recorded, for the long device
+    captures. It must be launched from the root of the application, like
+    the Flask app. Zeek reads the capture.pcap of the directory as it grows
+    (or an external Zeek writes its rotating logs in --logs) and the new
+    records are checked every --interval seconds, the alerts, conns,
+    whitelist and report files being rewritten as soon as new alerts
+    trigger. On SIGTERM or SIGINT, the end of the capture is checked and
+    Suricata runs on the whole capture.
+
+    The replay of a capture (e.g. medias/captures/*.pcap) at --rate packets
+    per second into capture.pcap simulates a recording, and stops the
+    analysis at its end.
+"""
+
+
+class LiveAnalysis(object):
+
+    def __init__(self, capture_directory, log_directory=None, interval=2):
+        self.capture_directory = capture_directory
+        self.capture = os.path.join(capture_directory, "capture.pcap")
+        self.assets = os.path.join(capture_directory, "assets")
+        self.log_directory = log_directory or self.assets
+        self.interval = interval
+        self.version = get_tables_version()
+        self.engine = LiveZeekEngine(capture_directory, self.log_directory)
+        self.zeek = None
+        self.feeder = None
+        self.printed = set()
+        self.nb_conns = 0
+
+    def start_zeek(self, stop):
+        """
+            Start zeek on its stdin, fed with the capture as it grows.
+            Its logs are written in the assets directory.
+            :return: nothing.
+        """
+        json_logs = ["LogAscii::use_json=T"] if get_config_bool(("analysis", "zeek_json")) else []
+        self.zeek = sp.Popen(["/opt/zeek/bin/zeek", "-C", "-r", "-", "protocols/ssl/validate-certs"] + json_logs,
+                             stdin=sp.PIPE, cwd=self.assets)
+        self.feeder = Thread(target=self.feed_zeek, args=(stop,))
+        self.feeder.start()
+
+    def feed_zeek(self, stop):
+        """
+            Copy the capture to zeek as it is written, until stop is set
+            and the end of the capture is reached.
+            :return: nothing.
+        """
+        try:
+            while not os.path.isfile(self.capture):
+                if stop.wait(self.interval):
+                    return
+            with open(self.capture, "rb") as f:
+                while True:
+                    data = f.read(1024 * 1024)
+                    if data:
+                        self.zeek.stdin.write(data)
+                        self.zeek.stdin.flush()
+                    elif stop.is_set():
+                        return
+                    else:
+                        time.sleep(0.2)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                self.zeek.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def poll(self):
+        """
+            Check the new records, with the IOCs and the whitelist reloaded
+            if they have been updated.
+            :return: bool - True if there are new alerts or conns.
+        """
+        version = get_tables_version()
+        if version != self.version:
+            self.version = version
+            self.engine.ioc_index = None
+            if self.engine.whitelist_analysis:
+                self.engine.whitelist_matcher = WhitelistMatcher()
+        db.session.remove()
+
+        new_alerts = self.engine.poll()
+        nb_conns, self.nb_conns = self.nb_conns, len(self.engine.conns)
+        return new_alerts > 0 or nb_conns != self.nb_conns
+
+    def publish(self, suricata=None, capture_sha1="N/A"):
+        """
+            Write the alerts, conns, whitelist and report files, and print
+            the alerts published for the first time. An advice updated with
+            a new count of alerts isn't printed again.
+            :return: nothing.
+        """
+        alerts = self.engine.retrieve_alerts()
+        write_json(os.path.join(self.assets, "whitelist.json"), self.engine.retrieve_whitelist())
+        write_json(os.path.join(self.assets, "conns.json"), self.engine.retrieve_conns())
+        write_alerts(self.capture_directory, [alerts] if suricata is None else [alerts, suricata])
+        write_report(self.capture_directory, capture_sha1)
+
+        for alert in alerts:
+            title = (alert.id, alert.host, alert.title_args)
+            if title not in self.printed:
+                self.printed.add(title)
+                print("[{}] {}".format(alert.level, render_alert(alert)["title"]), flush=True)
+
+    def run(self, stop, follow_capture=True):
+        """
+            Check the capture until stop is set, then check its end.
+            :return: nothing.
+        """
+        os.makedirs(self.assets, exist_ok=True)
+        if follow_capture:
+            self.start_zeek(stop)
+
+        self.publish()
+        while not stop.is_set():
+            if self.poll():
+                self.publish()
+            stop.wait(self.interval)
+
+        if self.zeek is not None:
+            self.feeder.join()
+            self.zeek.wait()
+        self.poll()
+        self.engine.finish()
+
+        suricata = None
+        if os.path.isfile(self.capture):
+            engine = SuricataEngine(self.capture_directory)
+            engine.start_suricata()
+            suricata = engine.get_alerts()
+        self.publish(suricata, None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live analysis of a capture being recorded.")
+    parser.add_argument("capture_directory")
+    parser.add_argument("--logs", help="directory of the logs of a running zeek, followed instead of capture.pcap")
+    parser.add_argument("--interval", type=float, default=2, help="seconds between two checks")
+    parser.add_argument("--replay", metavar="PCAP", help="capture replayed into capture.pcap")
+    parser.add_argument("--rate", type=float, default=100, help="packets per second of the replay")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.capture_directory):
+        print("The directory doesn't exist.")
+        sys.exit(1)
+
+    # Check the end of the capture on SIGTERM or SIGINT.
+    stop = Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    app = return_app()
+    with app.app_context():
+        live = LiveAnalysis(args.capture_directory, args.logs, args.interval)
+        if args.replay:
+            replayer = PcapReplayer(args.replay, live.capture, args.rate)
+            Thread(target=lambda: (replayer.run(stop), stop.set()), daemon=True).start()
+        live.run(stop, follow_capture=args.logs is None)
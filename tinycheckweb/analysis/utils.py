@@ -4,6 +4,7 @@
 import sqlite3
 import datetime
 import yaml
+import re
 import sys
 import json
 import os
@@ -15,26 +16,80 @@ from flask import current_app
 #element from tinycheckweb module as shown below
 sys.path.append(os.path.abspath('./'))
 
-from tinycheckweb.models import IOC, Whitelist
+from sqlalchemy import select
+from tinycheckweb import db
+from tinycheckweb.models import IOC, Whitelist, TableVersion
+from classes.localeregistry import LocaleRegistry
 
 parent = "/".join(sys.path[0].split("/")[:-1])
 
+_snapshot = {"version": None, "iocs": {}, "whitelist": {}}
+
+
+def get_tables_version():
+    """
+        Get the versions of the IOC and whitelist tables, bumped by
+        triggers each time a row is inserted, updated or deleted.
+        :return: tuple
+    """
+    return tuple(db.session.execute(select([TableVersion.name, TableVersion.version])
+                                    .order_by(TableVersion.name)))
+
+
+def load_snapshot():
+    """
+        Get the process-wide snapshot of the IOC and whitelist tables.
+        Both tables are read by a single query each, and only read
+        again when their version changes.
+        :return: dict - shared snapshot, which must not be modified.
+    """
+    version = get_tables_version()
+    if version != _snapshot["version"]:
+        iocs, whitelist = {}, {}
+        for ioc_type, value, tag in db.session.execute(select([IOC.type, IOC.value, IOC.tag])):
+            iocs.setdefault(ioc_type, []).append((value, tag))
+        for elem_type, element in db.session.execute(select([Whitelist.type, Whitelist.element])):
+            whitelist.setdefault(elem_type, []).append(element)
+
+        _snapshot["iocs"] = {t: tuple(v) for t, v in iocs.items()}
+        _snapshot["whitelist"] = {t: tuple(v) for t, v in whitelist.items()}
+        _snapshot["version"] = version
+    return _snapshot
+
+
 def get_iocs(ioc_type):
     """
         Get a list of IOCs specified by their type.
-        :return: list of IOCs
+        :return: tuple of (value, tag)
     """
-    res = IOC.query.filter_by(type=ioc_type).all()
-    return [[r.value, r.tag] for r in res] if res is not None else []
+    return load_snapshot()["iocs"].get(ioc_type, ())
 
 
 def get_whitelist(elem_type):
     """
         Get a list of whitelisted elements specified by their type.
-        :return: list of elements
+        :return: tuple of elements
+    """
+    return load_snapshot()["whitelist"].get(elem_type, ())
+
+
+_config = {"mtime": None, "tree": None}
+
+
+def load_config():
     """
-    res = Whitelist.query.filter_by(type=elem_type).all()
-    return [r.element for r in res] if res is not None else []
+        Get the parsed configuration. The file is only parsed again
+        when its modification time changes, so edits are still picked
+        up by the long-lived processes.
+        :return: dict - shared tree, which must not be modified.
+    """
+    path = os.path.join(parent, "config.yaml")
+    mtime = os.stat(path).st_mtime_ns
+    if _config["mtime"] != mtime:
+        with open(path, "r") as f:
+            _config["tree"] = yaml.load(f, Loader=yaml.SafeLoader)
+        _config["mtime"] = mtime
+    return _config["tree"]
 
 
 def get_config(path):
@@ -42,9 +97,95 @@ def get_config(path):
         Read a value from the configuration
         :return: value (it can be any type)
     """
-    config = yaml.load(open(os.path.join(parent, "config.yaml"),
-                            "r"), Loader=yaml.SafeLoader)
-    return reduce(dict.get, path, config)
+    return reduce(dict.get, path, load_config())
+
+
+def get_typed_config(path, kind, default=None):
+    """
+        Read a value of a given type from the configuration.
+        :return: value or default if it isn't set, raises ValueError
+                 if it is of another type.
+    """
+    value = get_config(path)
+    if value is None:
+        return default
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ValueError("{} must be of type {} in config.yaml".format(".".join(path), kind.__name__))
+    return value
+
+
+def get_config_int(path, default=0):
+    """
+        Read an integer from the configuration.
+        :return: int
+    """
+    return get_typed_config(path, int, default)
+
+
+def get_config_bool(path, default=False):
+    """
+        Read a boolean from the configuration.
+        :return: bool
+    """
+    return get_typed_config(path, bool, default)
+
+
+def get_config_str(path, default=""):
+    """
+        Read a string from the configuration.
+        :return: str
+    """
+    return get_typed_config(path, str, default)
+
+
+def get_config_list(path):
+    """
+        Read a list from the configuration.
+        :return: tuple, so the cached configuration can't be modified.
+    """
+    return tuple(get_typed_config(path, list, []))
+
+
+_locales = {"registry": None}
+
+
+def get_locales():
+    """
+        Get the registry of the locale files, which are all read and
+        checked once per process.
+        :return: LocaleRegistry
+    """
+    if _locales["registry"] is None:
+        registry = LocaleRegistry(os.path.join(os.path.dirname(os.path.realpath(__file__)), "locales"))
+        for error in registry.errors:
+            print("Locale: {}".format(error), file=sys.stderr)
+        _locales["registry"] = registry
+    return _locales["registry"]
+
+
+def get_user_lang():
+    """
+        Get the user language from the configuration.
+        :return: str
+    """
+    userlang = get_config_str(("frontend", "user_lang"), "en")
+    return userlang if re.match("^[a-z]{2,3}$", userlang) else "en"
+
+
+def get_template(section):
+    """
+        Get a section of the locale file of the user language.
+        :return: dict
+    """
+    return get_locales().get(get_user_lang())[section]
+
+
+def render_alert(alert):
+    """
+        Render an alert, raised as its id and arguments, in the user language.
+        :return: dict
+    """
+    return get_locales().render_alert(get_user_lang(), alert)
 
 
 
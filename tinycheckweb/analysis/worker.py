@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from classes.iocindex import IOCIndex
+from classes.whitelistmatcher import WhitelistMatcher
+from classes.suricataengine import SuricataEngine
+from classes.suricatasocket import SuricataSocket
+from multiprocessing import Process, Event
+from threading import Thread, Event as ThreadEvent
+from analysis import analyse
+from utils import get_config_bool, get_config_int, get_config_str, get_locales, get_tables_version
+from traceback import print_exc
+import signal
+import socket
+import time
+import sys
+import os
+sys.path.append(os.path.abspath('./'))
+from run import return_app
+from tinycheckweb import db
+from tinycheckweb.models import Job, Capture, Worker, upgrade_db
+from tinycheckweb.capture.cache import ResultCache
+
+"""
+    Long-lived pool of analysis workers. It must be launched from the root
+    of the application, like the Flask app. The workers take the queued
+    jobs of the jobs table in order, so at most analysis.workers analyses
+    run at the same time and the queue survives restarts.
+"""
+
+
+class AnalysisWorker(Process):
+    """
+        Worker process keeping the app context, the IOC index, the
+        whitelist matcher and the locale templates loaded between analyses.
+    """
+
+    POLL_INTERVAL = 1
+    HEARTBEAT_INTERVAL = 10
+
+    def __init__(self, stop):
+        super().__init__()
+        self.stop = stop
+        self.version = None
+        self.ioc_index = None
+        self.whitelist_matcher = None
+        self.job_id = None
+
+    def preload(self):
+        """
+            Load the IOC index, the whitelist matcher and the locale templates.
+            :return: nothing.
+        """
+        self.version = get_tables_version()
+        self.ioc_index = IOCIndex() if get_config_bool(("analysis", "iocs")) else None
+        self.whitelist_matcher = WhitelistMatcher() if get_config_bool(("analysis", "whitelist")) else None
+        get_locales()
+
+    def claim(self):
+        """
+            Take the oldest queued job. The state is only changed if it is
+            still queued, so a job is never run by two workers.
+            :return: Job or None.
+        """
+        job = Job.query.filter_by(state="queued").order_by(Job.id).first()
+        if job is None:
+            return None
+
+        now = int(time.time())
+        claimed = Job.query.filter_by(id=job.id, state="queued").update(
+            {"state": "running", "started_on": now, "heartbeat": now})
+        db.session.commit()
+        return job if claimed else None
+
+    def beat(self, app, worker_id, done):
+        """
+            Record the heartbeat of the worker, and of the job it runs,
+            every HEARTBEAT_INTERVAL seconds, the analyses running in the
+            main thread of the process, until done is set: after a stop,
+            the current analysis still has to end.
+            :return: nothing.
+        """
+        with app.app_context():
+            while True:
+                try:
+                    now = int(time.time())
+                    db.session.merge(Worker(id=worker_id, heartbeat=now))
+                    if self.job_id is not None:
+                        Job.query.filter_by(id=self.job_id, state="running").update({"heartbeat": now})
+                    db.session.commit()
+                except Exception:
+                    print_exc()
+                    db.session.rollback()
+                if done.wait(self.HEARTBEAT_INTERVAL):
+                    break
+            Worker.query.filter_by(id=worker_id).delete()
+            db.session.commit()
+            db.session.remove()
+
+    def finish(self, job, state, error=None):
+        """
+            Record the end of a job.
+            :return: nothing.
+        """
+        job.state = state
+        job.error = error
+        job.finished_on = int(time.time())
+        db.session.commit()
+
+    def run(self):
+        app = return_app()
+        with app.app_context():
+            cache = ResultCache(app.root_path)
+            self.preload()
+            done = ThreadEvent()
+            heartbeat = Thread(target=self.beat, args=(app, "{}:{}".format(socket.gethostname(), os.getpid()), done))
+            heartbeat.start()
+            while not self.stop.is_set():
+                job = self.claim()
+                if job is None:
+                    db.session.remove()
+                    self.stop.wait(self.POLL_INTERVAL)
+                    continue
+                self.job_id = job.id
+
+                # Reload the IOCs and the whitelist if they have been updated.
+                if get_tables_version() != self.version:
+                    self.preload()
+
+                try:
+                    capture_directory = "/tmp/{}".format(job.token)
+                    capture_sha1 = Capture.query.get(job.capture_id).sha1
+                    key = cache.key(capture_directory, capture_sha1)
+                    analyse(capture_directory, self.ioc_index, self.whitelist_matcher, capture_sha1)
+                    cache.put(key, capture_directory)
+                    self.finish(job, "done")
+                except Exception as e:
+                    print_exc()
+                    db.session.rollback()
+                    self.finish(job, "failed", str(e))
+                finally:
+                    self.job_id = None
+                    db.session.remove()
+            done.set()
+            heartbeat.join()
+
+
+if __name__ == "__main__":
+    app = return_app()
+    stop = Event()
+
+    # Upgrade the database and requeue the jobs interrupted by a previous
+    # stop of the pool.
+    daemon = None
+    with app.app_context():
+        upgrade_db()
+        Job.query.filter_by(state="running").update({"state": "queued", "started_on": None})
+        db.session.commit()
+
+        # Start the suricata daemon shared by the workers, if enabled.
+        socket_path = get_config_str(("analysis", "suricata_socket"))
+        if socket_path:
+            suricata = SuricataEngine("/tmp")
+            if suricata.generate_rule_file():
+                daemon = SuricataSocket.start_daemon(socket_path, suricata.rules_file)
+
+        db.session.remove()
+        db.engine.dispose()
+
+    # Start the workers.
+    workers = [AnalysisWorker(stop) for _ in range(get_config_int(("analysis", "workers"), 1))]
+    for worker in workers:
+        worker.start()
+
+    # Let the workers end their current job on SIGTERM.
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait()
@@ -1,8 +1,10 @@
 import os
-import sys
 import json
-import subprocess as sp
+import time
 from flask import current_app, jsonify
+from tinycheckweb.models import Job, Worker
+from tinycheckweb import db
+from .cache import ResultCache
 
 
 class Analysis(object):
@@ -10,23 +12,84 @@ class Analysis(object):
     def __init__(self, token):
         self.token = token
 
-    def start(self):
+    @staticmethod
+    def fail_stale_jobs():
         """
-            Start an analysis of the captured communication by lauching
-            analysis.py with the capture token as a paramater.
+            Fail the jobs nobody takes care of anymore, so their users can
+            start a new analysis instead of waiting forever: the running
+            jobs whose worker stopped sending heartbeats for
+            ANALYSIS_WORKER_TIMEOUT seconds (killed, out of memory...),
+            and, when no worker of the pool is alive, the jobs queued for
+            more than ANALYSIS_QUEUE_TIMEOUT seconds.
+
+            :return: int - number of failed jobs
+        """
+        now = int(time.time())
+        alive = now - current_app.config["ANALYSIS_WORKER_TIMEOUT"]
+
+        failed = Job.query.filter(Job.state == "running",
+                                  db.func.coalesce(Job.heartbeat, Job.started_on) < alive) \
+                          .update({"state": "failed", "finished_on": now,
+                                   "error": "The analysis worker stopped during the analysis"},
+                                  synchronize_session=False)
+
+        if not Worker.query.filter(Worker.heartbeat >= alive).count():
+            failed += Job.query.filter(Job.state == "queued",
+                                       Job.created_on < now - current_app.config["ANALYSIS_QUEUE_TIMEOUT"]) \
+                               .update({"state": "failed", "finished_on": now,
+                                        "error": "No analysis worker took the job in time"},
+                                       synchronize_session=False)
+        db.session.commit()
+        return failed
+
+    def start(self, capture):
+        """
+            Start an analysis of the captured communication by adding a
+            job to the queue of the analysis worker pool (analysis/worker.py),
+            which runs at most analysis.workers analyses at the same time.
+            The results of a previous analysis of the same capture with the
+            same IOCs, whitelist and configuration are reused if available.
 
             :return: dict containing the analysis status
         """
 
         if self.token is not None:
-            parent = current_app.root_path
-            sp.Popen(
-                [sys.executable, "{}/analysis/analysis.py".format(parent), "/tmp/{}".format(self.token)])
+            capture_directory = "/tmp/{}".format(self.token)
+            now = int(time.time())
+            job = Job(token=self.token, state="queued", capture_id=capture.id,
+                      user_id=capture.user_id, created_on=now)
+
+            cache = ResultCache(current_app.root_path)
+            if cache.get(cache.key(capture_directory, capture.sha1), capture_directory):
+                job.state = "done"
+                job.started_on = job.finished_on = now
 
-            return {"message": "Analysis started"}
+            db.session.add(job)
+            db.session.commit()
+
+            if job.state == "done":
+                return {"message": "Analysis done", "job": job.to_dict()}
+            return {"message": "Analysis queued", "job": job.to_dict()}
         else:
             return {"message": "Bad token provided"}
 
+    def get_status(self, user):
+        """
+            Get the status of the latest analysis job of a user, with its
+            position in the queue while it waits for a worker.
+
+            :return: dict containing the job status
+        """
+        self.fail_stale_jobs()
+        job = Job.query.order_by(Job.id.desc()).filter_by(user_id=user.id).first()
+        if job is None:
+            return {"message": "No analysis found ! Try to make analysis"}
+
+        status = job.to_dict()
+        if job.state == "queued":
+            status["position"] = Job.query.filter(Job.state == "queued", Job.id < job.id).count()
+        return status
+
     def get_report(self):
         """Get the full report in JSON Format"""
         report = {}
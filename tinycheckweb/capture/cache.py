@@ -0,0 +1,171 @@
+import os
+import time
+import yaml
+import shutil
+import hashlib
+import uuid
+from tinycheckweb.models import TableVersion
+from tinycheckweb import db
+from .pcap import sha1_file
+
+
+class ResultCache(object):
+    """
+        Content-addressed cache of the analysis results. Results are stored
+        under the SHA1 of the pcap combined with a fingerprint of the IOCs,
+        the whitelist and the configuration, so any update of them leads
+        to new keys and the stale results are never served.
+
+        The active analysis results (domain ages, NS and WHOIS records)
+        change over time, so when it is enabled the entries expire like
+        the enrichment cache ones, after analysis.active_cache_ttl seconds.
+
+        Each entry records its fingerprint: when a new entry is stored, the
+        entries of other fingerprints, the expired ones and then the oldest
+        ones above max_entries are removed, so the cache doesn't grow
+        without bound on the SD card.
+    """
+
+    FILES = ["report.json", "assets/alerts.json", "assets/conns.json", "assets/whitelist.json"]
+    MAX_ENTRIES = 100
+    # Age of the partial entries of interrupted writes removed by prune.
+    TMP_MAX_AGE = 3600
+
+    def __init__(self, root_path, max_entries=MAX_ENTRIES):
+        self.root_path = root_path
+        self.directory = os.path.join(root_path, "medias/results")
+        self.max_entries = max_entries
+
+    def fingerprint(self):
+        """
+            Fingerprint the versions of the IOCs, the whitelist and the
+            configuration used by the analysis.
+            :return: str
+        """
+        tables = db.session.query(TableVersion.name, TableVersion.version).order_by(TableVersion.name).all()
+        with open(os.path.join(self.root_path, "config.yaml"), "rb") as f:
+            config = hashlib.sha1(f.read()).hexdigest()
+        return "{}:{}".format(tables, config)
+
+    def max_age(self):
+        """
+            Get the maximum age of the entries.
+            :return: int - seconds, or None if the entries don't expire.
+        """
+        with open(os.path.join(self.root_path, "config.yaml"), "r") as f:
+            analysis = (yaml.load(f, Loader=yaml.SafeLoader) or {}).get("analysis") or {}
+        if not analysis.get("active"):
+            return None
+        return analysis.get("active_cache_ttl") or 0
+
+    def expired(self, entry):
+        """
+            Check if an entry is older than the maximum age.
+            :return: bool
+        """
+        max_age = self.max_age()
+        return max_age is not None and time.time() - os.path.getmtime(entry) > max_age
+
+    def key(self, capture_directory, capture_sha1=None):
+        """
+            Get the cache key of the capture of an analysis directory.
+            :return: str
+        """
+        capture_sha1 = capture_sha1 or sha1_file(os.path.join(capture_directory, "capture.pcap"))
+        return hashlib.sha1("{}:{}".format(capture_sha1, self.fingerprint()).encode()).hexdigest()
+
+    def get(self, key, capture_directory):
+        """
+            Restore the cached results of a key into an analysis directory.
+            :return: bool - True on a cache hit.
+        """
+        entry = os.path.join(self.directory, key)
+        if not os.path.isdir(entry) or self.expired(entry):
+            return False
+
+        # The entry can be pruned by a worker meanwhile.
+        try:
+            for name in self.FILES:
+                shutil.copyfile(os.path.join(entry, name), os.path.join(capture_directory, name))
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, capture_directory):
+        """
+            Store the results of an analysis directory, after the pruning
+            of the cache. The entry is written aside then renamed, so
+            readers never see a partial entry. An expired entry is moved
+            away and replaced.
+            :return: nothing.
+        """
+        entry = os.path.join(self.directory, key)
+        if os.path.isdir(entry) and not self.expired(entry):
+            return
+
+        fingerprint = self.fingerprint()
+        self.prune(fingerprint, self.max_entries - 1)
+        tmp = os.path.join(self.directory, ".{}".format(uuid.uuid4()))
+        try:
+            os.makedirs(os.path.join(tmp, "assets"))
+            for name in self.FILES:
+                shutil.copyfile(os.path.join(capture_directory, name), os.path.join(tmp, name))
+            with open(os.path.join(tmp, "fingerprint"), "w") as f:
+                f.write(fingerprint)
+            if os.path.isdir(entry):
+                self.remove(entry)
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def remove(self, entry):
+        """
+            Remove an entry, moved away first so it disappears at once.
+            :return: nothing.
+        """
+        removed = os.path.join(self.directory, ".{}".format(uuid.uuid4()))
+        try:
+            os.rename(entry, removed)
+        except OSError:
+            return
+        shutil.rmtree(removed, ignore_errors=True)
+
+    def prune(self, fingerprint, max_entries):
+        """
+            Remove the entries of another fingerprint (or without one), the
+            expired entries and the partial entries older than TMP_MAX_AGE,
+            then the oldest entries to keep at most max_entries of them.
+            :return: int - number of removed entries.
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+
+        now = time.time()
+        max_age = self.max_age()
+        entries, removed = [], 0
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            try:
+                mtime = os.path.getmtime(entry)
+                if name.startswith("."):
+                    stale = now - mtime > self.TMP_MAX_AGE
+                else:
+                    with open(os.path.join(entry, "fingerprint"), "r") as f:
+                        stale = f.read() != fingerprint or (max_age is not None and now - mtime > max_age)
+            except OSError:
+                stale = not name.startswith(".")
+                mtime = 0
+            if stale:
+                if name.startswith("."):
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    self.remove(entry)
+                removed += 1
+            elif not name.startswith("."):
+                entries.append((mtime, entry))
+
+        entries.sort()
+        for _, entry in entries[:max(0, len(entries) - max_entries)]:
+            self.remove(entry)
+            removed += 1
+        return removed
@@ -0,0 +1,175 @@
+import os
+import shutil
+import struct
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha1_file(path):
+    """
+        Hash a file by chunks, without loading it in memory.
+        :return: str - SHA1 hex digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PcapInspector(object):
+    """
+        Incremental inspector of pcap and pcapng files. Data is fed by
+        chunks as it arrives: the magic header is checked on the first
+        bytes, the packets are counted by walking the record or block
+        headers and the content is hashed, so the file never has to be
+        read again once written.
+    """
+
+    PCAP_MAGICS = {b"\xd4\xc3\xb2\xa1": "<", b"\xa1\xb2\xc3\xd4": ">",
+                   b"\x4d\x3c\xb2\xa1": "<", b"\xa1\xb2\x3c\x4d": ">"}
+    PCAPNG_MAGIC = b"\x0a\x0d\x0d\x0a"
+    PCAPNG_BYTE_ORDER = {b"\x4d\x3c\x2b\x1a": "<", b"\x1a\x2b\x3c\x4d": ">"}
+    # Packet, Simple Packet and Enhanced Packet blocks.
+    PCAPNG_PACKET_BLOCKS = (2, 3, 6)
+    MAX_RECORD_SIZE = 1 << 28
+
+    def __init__(self):
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+        self.packets = 0
+        self.format = None
+        self.endian = None
+        self.buffer = b""
+        self.skip = 0
+
+    def update(self, chunk):
+        """
+            Feed the next chunk of the file.
+            :return: nothing, raises ValueError on an invalid file.
+        """
+        self.sha1.update(chunk)
+        self.size += len(chunk)
+
+        data = self.buffer + chunk if self.buffer else chunk
+        offset, end = 0, len(data)
+        while True:
+            if self.skip:
+                step = min(self.skip, end - offset)
+                self.skip -= step
+                offset += step
+                if self.skip:
+                    break
+            needed = self.parse(data, offset, end)
+            if needed is None:
+                break
+            offset += needed
+        self.buffer = bytes(data[offset:])
+
+    def parse(self, data, offset, end):
+        """
+            Parse the header at offset, if it is complete, and set the
+            number of bytes to skip after it.
+            :return: int - size of the parsed header or None.
+        """
+        available = end - offset
+        if self.format is None:
+            if available < 4:
+                return None
+            magic = bytes(data[offset:offset + 4])
+            if magic in self.PCAP_MAGICS:
+                # Global header of the file.
+                if available < 24:
+                    return None
+                self.format, self.endian = "pcap", self.PCAP_MAGICS[magic]
+                return 24
+            elif magic == self.PCAPNG_MAGIC:
+                self.format = "pcapng"
+            else:
+                raise ValueError("Not a pcap or pcapng file")
+
+        if self.format == "pcap":
+            if available < 16:
+                return None
+            length, = struct.unpack_from(self.endian + "I", data, offset + 8)
+            if length > self.MAX_RECORD_SIZE:
+                raise ValueError("Invalid pcap record length")
+            self.packets += 1
+            self.skip = length
+            return 16
+
+        # pcapng: the byte order is given by each Section Header Block.
+        if available < 12:
+            return None
+        if bytes(data[offset:offset + 4]) == self.PCAPNG_MAGIC:
+            endian = self.PCAPNG_BYTE_ORDER.get(bytes(data[offset + 8:offset + 12]))
+            if endian is None:
+                raise ValueError("Invalid pcapng byte-order magic")
+            self.endian = endian
+        block_type, length = struct.unpack_from(self.endian + "II", data, offset)
+        if length < 12 or length % 4 or length > self.MAX_RECORD_SIZE:
+            raise ValueError("Invalid pcapng block length")
+        if block_type in self.PCAPNG_PACKET_BLOCKS:
+            self.packets += 1
+        self.skip = length - 12
+        return 12
+
+    def finish(self):
+        """
+            Check that the file doesn't end in the middle of a header
+            or a packet.
+            :return: str - SHA1 hex digest, raises ValueError otherwise.
+        """
+        if self.format is None or self.buffer or self.skip:
+            raise ValueError("Truncated pcap file")
+        return self.sha1.hexdigest()
+
+    @classmethod
+    def from_file(cls, path):
+        """
+            Rebuild the inspector of a partially uploaded file.
+            :return: PcapInspector
+        """
+        inspector = cls()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                inspector.update(chunk)
+        return inspector
+
+
+def save_stream(stream, path, inspector=None, mode="wb", limit=None):
+    """
+        Write an uploaded stream to its final path by chunks, inspecting
+        it on the fly. The stream is rejected at the first invalid header.
+        At most limit bytes are written if it is set.
+        :return: PcapInspector
+    """
+    inspector = inspector or PcapInspector()
+    remaining = limit
+    with open(path, mode) as f:
+        while remaining is None or remaining > 0:
+            chunk = stream.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            inspector.update(chunk)
+            f.write(chunk)
+    return inspector
+
+
+def link_or_copy(source_path, dest_path):
+    """
+        Hardlink a file, or copy it if the destination is on another
+        filesystem (the copy is done in kernel space by shutil).
+
+        The destination shares its data with the source, so it must never
+        be written in place (opened with "wb", "ab" or "r+b"): a writer
+        unlinks it first and creates a new file, or the source is changed.
+        :return: nothing.
+    """
+    try:
+        os.link(source_path, dest_path)
+    except OSError:
+        shutil.copyfile(source_path, dest_path)
@@ -1,17 +1,22 @@
 import os, uuid, shutil,sys,json
 import subprocess as sp
 from flask import Blueprint, jsonify, request, current_app
+from werkzeug.http import parse_content_range_header
 from sqlalchemy import desc
 from flask_jwt_extended  import jwt_required,get_jwt_identity
-from werkzeug.utils import secure_filename
-from tinycheckweb.models import Capture, User
+from tinycheckweb.models import Capture, User, Job
 from tinycheckweb import db
 from .analysis import Analysis
+from .pcap import PcapInspector, save_stream, sha1_file, link_or_copy
 
 capture = Blueprint('capture',__name__)
 
 ALLOWED_EXTENSIONS = {'pcap'}
 
+# Inspectors of the uploads in progress, by capture id. They are rebuilt
+# from the partial file when missing, e.g. after a restart.
+inspectors = {}
+
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -37,25 +42,111 @@ def upload_pcap():
             # Path where we will store our file
             upload_path = current_app.root_path+current_app.config["UPLOAD_FOLDER"]
 
-            # Get the filename of the uploaded file    
-            filename = secure_filename(file.filename)
-            # Save the file in our server
-            file.save(os.path.join(upload_path, filename))
-
-            # Rename the uploaded file with the unique identifier
-            source_path = upload_path+filename
+            # Save the file in our server under a unique identifier,
+            # checking and hashing it while it is written
             new_name = str(uuid.uuid4())+'.pcap'
             dest_path = upload_path+ new_name
-            os.rename(source_path, dest_path)
+            try:
+                inspector = save_stream(file.stream, dest_path)
+                sha1 = inspector.finish()
+            except ValueError as e:
+                os.remove(dest_path)
+                return jsonify(status=False, error=str(e)), 400
             
             # Save the file within the database 
-            capture = Capture(path=new_name, user_id=user.id)
+            capture = Capture(path=new_name, sha1=sha1, size=inspector.size,
+                              packets=inspector.packets, user_id=user.id)
             db.session.add(capture)
             db.session.commit()
 
             return jsonify(status=True, message="Upload perform successfully"), 200
 
 
+@capture.route('/uploads', methods=['POST'])
+@jwt_required()
+def create_upload():
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+
+    if user :
+        # Create the empty file of the capture, filled by PUT /uploads/<id>
+        upload_path = current_app.root_path+current_app.config["UPLOAD_FOLDER"]
+        new_name = str(uuid.uuid4())+'.pcap'
+        open(upload_path+new_name, "wb").close()
+
+        capture = Capture(path=new_name, size=0, complete=False, user_id=user.id)
+        db.session.add(capture)
+        db.session.commit()
+
+        return jsonify(status=True, id=capture.id, offset=0), 201
+
+
+@capture.route('/uploads/<int:capture_id>', methods=['GET', 'PUT'])
+@jwt_required()
+def upload_chunk(capture_id):
+    """
+        Resumable upload of a capture. Each PUT appends the chunk of its
+        body, located by a "Content-Range: bytes start-end/total" header,
+        and the upload is complete once total bytes have been received.
+        The body is written up to the end of the range, and a chunk shorter
+        than its range is dropped with a 400.
+        A PUT without Content-Range sends the whole remaining file. GET
+        returns the offset to resume from after an interruption.
+    """
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+    capture = Capture.query.filter_by(id=capture_id, user_id=user.id).first() if user else None
+    if capture is None:
+        return jsonify(status=False, error="Upload not found"), 404
+
+    dest_path = current_app.root_path+current_app.config["UPLOAD_FOLDER"]+capture.path
+    offset = os.path.getsize(dest_path) if os.path.exists(dest_path) else 0
+
+    if request.method == 'GET':
+        return jsonify(status=True, id=capture.id, offset=offset,
+                       complete=capture.complete, packets=capture.packets), 200
+    if capture.complete:
+        return jsonify(status=False, error="Upload already complete"), 409
+
+    content_range = None
+    if 'Content-Range' in request.headers:
+        content_range = parse_content_range_header(request.headers['Content-Range'])
+        if content_range is None or content_range.units != 'bytes':
+            return jsonify(status=False, error="Bad Content-Range header"), 400
+        if content_range.start != offset:
+            return jsonify(status=False, error="Chunk doesn't start at the offset",
+                           offset=offset), 409
+
+    inspector = inspectors.pop(capture.id, None)
+    if inspector is None or inspector.size != offset:
+        inspector = PcapInspector.from_file(dest_path)
+
+    try:
+        limit = content_range.stop - content_range.start if content_range else None
+        save_stream(request.stream, dest_path, inspector, mode="ab", limit=limit)
+        if content_range is not None and inspector.size != content_range.stop:
+            # Drop the incomplete chunk, the client sends it again.
+            os.truncate(dest_path, offset)
+            return jsonify(status=False, error="Chunk shorter than its Content-Range",
+                           offset=offset), 400
+        complete = content_range is None or content_range.length == inspector.size
+        if complete:
+            capture.sha1 = inspector.finish()
+    except ValueError as e:
+        os.remove(dest_path)
+        db.session.delete(capture)
+        db.session.commit()
+        return jsonify(status=False, error=str(e)), 400
+
+    capture.size = inspector.size
+    capture.packets = inspector.packets
+    capture.complete = complete
+    db.session.commit()
+    if not complete:
+        inspectors[capture.id] = inspector
+
+    return jsonify(status=True, id=capture.id, offset=inspector.size,
+                   complete=complete, packets=capture.packets), 200
+
+
 @capture.route('/start-analysis', methods=['POST'])
 @jwt_required()
 def start_analysis():
@@ -68,6 +159,12 @@ def start_analysis():
         # Get the first part of the name of user to make his username
         token = user.email.split('@')[0]
 
+        # Don't touch the analysis directory while a job of the user
+        # is waiting for or being run by a worker.
+        Analysis.fail_stale_jobs()
+        if Job.query.filter(Job.user_id == user.id, Job.state.in_(["queued", "running"])).count():
+            return jsonify(message="An analysis is already in progress"), 409
+
         #Delete a directory corresponding to the username of user if exist
         if os.path.exists(analyse_path+token):
             shutil.rmtree(analyse_path+token)
@@ -77,22 +174,36 @@ def start_analysis():
         os.makedirs(directory)
         
         # Get the latest pcap file of user to analyse
-        capture = Capture.query.order_by(Capture.id.desc()).filter_by(user_id=user.id).first()
+        capture = Capture.query.order_by(Capture.id.desc()).filter_by(user_id=user.id, complete=True).first()
 
         if capture :
             upload_path = current_app.root_path+current_app.config["UPLOAD_FOLDER"]
 
-            # Copy the latest uploaded pcap file of user into /tmp for analysing
+            # Link the latest uploaded pcap file of user into /tmp for analysing
             # and rename it in capture.pcap
             source_path = upload_path+capture.path
             new_filename = '/capture.pcap'
             dest_path = '/tmp/'+token + new_filename
-            shutil.copyfile(source_path, dest_path)
+            link_or_copy(source_path, dest_path)
+
+            # Captures uploaded before their hash was recorded
+            if capture.sha1 is None:
+                capture.sha1 = sha1_file(source_path)
+                db.session.commit()
             
-            return jsonify(Analysis(token).start())
+            return jsonify(Analysis(token).start(capture))
         else:
             return jsonify(message="No pcap file found ! Try to upload one")
 
+@capture.route('/job-status', methods=['GET'])
+@jwt_required()
+def job_status():
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+
+    if user :
+        token = user.email.split('@')[0]
+        return jsonify(Analysis(token).get_status(user))
+
 @capture.route('/get-report', methods=['GET'])
 @jwt_required()
 def get_report():
@@ -5,3 +5,5 @@ class Config:
     UPLOAD_FOLDER = '/medias/captures/'
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     
+    ANALYSIS_QUEUE_TIMEOUT = 3600
+    ANALYSIS_WORKER_TIMEOUT = 60
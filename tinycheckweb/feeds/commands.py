@@ -0,0 +1,33 @@
+import click
+from flask.cli import AppGroup
+from .importer import FeedImporter
+
+feeds = AppGroup("feeds", help="Import the IOC and whitelist feeds.")
+
+
+@feeds.command("import-iocs")
+@click.argument("feed", type=click.File("r"))
+@click.option("--source", default="watcher", help="Source recorded for the IOCs.")
+@click.option("--batch-size", default=FeedImporter.BATCH_SIZE, help="Rows inserted per transaction.")
+def import_iocs(feed, source, batch_size):
+    """Import a JSON feed of IOCs."""
+    importer = FeedImporter(batch_size)
+    try:
+        inserted = importer.import_iocs(feed, source)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo("{} IOCs imported, {} skipped".format(inserted, importer.skipped))
+
+
+@feeds.command("import-whitelist")
+@click.argument("feed", type=click.File("r"))
+@click.option("--source", default="watcher", help="Source recorded for the elements.")
+@click.option("--batch-size", default=FeedImporter.BATCH_SIZE, help="Rows inserted per transaction.")
+def import_whitelist(feed, source, batch_size):
+    """Import a JSON feed of whitelisted elements."""
+    importer = FeedImporter(batch_size)
+    try:
+        inserted = importer.import_whitelist(feed, source)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo("{} elements imported, {} skipped".format(inserted, importer.skipped))
@@ -0,0 +1,144 @@
+import re
+import json
+import time
+from sqlalchemy import select
+from tinycheckweb import db
+from tinycheckweb.models import IOC, Whitelist
+
+IOC_TYPES = ("cidr", "domain", "freedns", "ip4addr", "ip6addr", "ns", "sha1cert", "snort", "tld")
+WHITELIST_TYPES = ("cidr", "domain", "ip4addr", "ip6addr")
+
+
+def iter_feed(f, key, chunk_size=1024 * 1024):
+    """
+        Stream the objects of the "key" array of a JSON feed, such as
+        {"iocs": [...]}, without loading the whole document in memory.
+        :return: generator of dict, raises ValueError on an invalid feed.
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"{}"\s*:\s*\['.format(re.escape(key)))
+
+    buffer, match = "", None
+    while match is None:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            raise ValueError("No {} array in the feed".format(key))
+        buffer += chunk
+        match = start.search(buffer)
+
+    buffer, offset = buffer[match.end():], 0
+    while True:
+        # Skip the separators, reading more data when the buffer runs out.
+        while offset < len(buffer) and buffer[offset] in " \t\r\n,":
+            offset += 1
+        if offset < len(buffer) and buffer[offset] == "]":
+            return
+        try:
+            if offset == len(buffer):
+                raise ValueError
+            item, offset = decoder.raw_decode(buffer, offset)
+        except ValueError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("Truncated or invalid feed")
+            buffer, offset = buffer[offset:] + chunk, 0
+            continue
+        yield item
+
+        if offset >= chunk_size:
+            buffer, offset = buffer[offset:], 0
+
+
+class FeedImporter(object):
+    """
+        Bulk importer of the IOC and whitelist feeds fetched by the
+        watchers. The feed is streamed, the elements already stored are
+        skipped and the new ones are inserted by batches, each batch in
+        its own transaction, with the database in WAL mode so readers
+        aren't blocked during the import.
+    """
+
+    BATCH_SIZE = 5000
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.skipped = 0
+
+    def import_iocs(self, f, source="watcher"):
+        """
+            Import an IOC feed, as {"iocs": [{"type", "value", "tag", "tlp"}]}.
+            :return: int - number of inserted IOCs.
+        """
+        added_on = int(time.time())
+
+        def rows():
+            for ioc in iter_feed(f, "iocs"):
+                try:
+                    ioc_type, value = ioc["type"], ioc["value"].strip()
+                    tag, tlp = ioc.get("tag", ""), ioc.get("tlp", "white")
+                except (KeyError, TypeError, AttributeError):
+                    self.skipped += 1
+                    continue
+                if ioc_type not in IOC_TYPES or not value:
+                    self.skipped += 1
+                    continue
+                yield (ioc_type, value), {"type": ioc_type, "value": value, "tag": tag,
+                                          "tlp": tlp, "source": source, "added_on": added_on}
+
+        return self.insert(IOC.__table__, select([IOC.type, IOC.value]), rows())
+
+    def import_whitelist(self, f, source="watcher"):
+        """
+            Import a whitelist feed, as {"elements": [{"type", "element"}]}.
+            :return: int - number of inserted elements.
+        """
+        added_on = int(time.time())
+
+        def rows():
+            for elem in iter_feed(f, "elements"):
+                try:
+                    elem_type, element = elem["type"], elem["element"].strip()
+                except (KeyError, TypeError, AttributeError):
+                    self.skipped += 1
+                    continue
+                if elem_type not in WHITELIST_TYPES or not element:
+                    self.skipped += 1
+                    continue
+                # The elements are unique across the types.
+                yield element, {"type": elem_type, "element": element,
+                                "source": source, "added_on": added_on}
+
+        return self.insert(Whitelist.__table__, select([Whitelist.element]), rows())
+
+    def insert(self, table, existing_query, rows):
+        """
+            Insert the rows whose key isn't already stored, by batches.
+            :return: int - number of inserted rows.
+        """
+        with db.engine.connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            seen = {r[0] if len(r) == 1 else tuple(r) for r in conn.execute(existing_query)}
+
+            inserted, batch = 0, []
+            for key, row in rows:
+                if key in seen:
+                    self.skipped += 1
+                    continue
+                seen.add(key)
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    inserted += self.flush(conn, table, batch)
+            if batch:
+                inserted += self.flush(conn, table, batch)
+        return inserted
+
+    def flush(self, conn, table, batch):
+        """
+            Insert a batch of rows with executemany, in one transaction.
+            :return: int - number of inserted rows.
+        """
+        with conn.begin():
+            conn.execute(table.insert(), batch)
+        count = len(batch)
+        del batch[:]
+        return count
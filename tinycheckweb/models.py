@@ -1,3 +1,4 @@
+from sqlalchemy import event, inspect, text, DDL
 from tinycheckweb import db
 
 class User(db.Model):
@@ -15,6 +16,10 @@ class Capture(db.Model):
     __tablename__="captures"
     id = db.Column(db.Integer, primary_key=True)
     path = db.Column(db.String(255), nullable=False)
+    sha1 = db.Column(db.String(40))
+    size = db.Column(db.BigInteger)
+    packets = db.Column(db.Integer)
+    complete = db.Column(db.Boolean, nullable=False, default=True, server_default="1")
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     def __repr__(self):
@@ -29,6 +34,7 @@ class IOC(db.Model):
     tag = db.Column(db.Text, nullable=False)
     source = db.Column(db.Text, nullable=False)
     added_on = db.Column(db.Numeric, nullable=False)
+    __table_args__ = (db.Index("ix_iocs_type_value", "type", "value"),)
 
 
 class Whitelist(db.Model):
@@ -36,4 +42,86 @@ class Whitelist(db.Model):
     element = db.Column(db.Text, nullable=False, unique=True)
     type = db.Column(db.Text, nullable=False)
     source = db.Column(db.Text, nullable=False)
-    added_on = db.Column(db.Integer, nullable=False)
\ No newline at end of file
+    added_on = db.Column(db.Integer, nullable=False)
+    __table_args__ = (db.Index("ix_whitelist_type_element", "type", "element"),)
+
+class TableVersion(db.Model):
+    __tablename__="table_versions"
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Bump the version of the IOC and whitelist tables on every change,
+# including the ones made outside of the app, so the analysis workers
+# only reload them when needed.
+VERSIONED_TABLES = ("iocs", "whitelist")
+VERSION_TRIGGER = """CREATE TRIGGER IF NOT EXISTS {0}_{1}_version AFTER {2} ON {0}
+BEGIN UPDATE table_versions SET version = version + 1 WHERE name = '{0}'; END"""
+
+for name in VERSIONED_TABLES:
+    event.listen(TableVersion.__table__, "after_create",
+                 DDL("INSERT INTO table_versions (name, version) VALUES ('{}', 0)".format(name)))
+for table in (IOC.__table__, Whitelist.__table__):
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        event.listen(table, "after_create", DDL(VERSION_TRIGGER.format(table.name, operation.lower(), operation)))
+
+
+class Job(db.Model):
+    __tablename__="jobs"
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(255), nullable=False)
+    state = db.Column(db.String(16), nullable=False, default="queued", index=True)
+    error = db.Column(db.Text)
+    capture_id = db.Column(db.Integer, db.ForeignKey('captures.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_on = db.Column(db.Integer, nullable=False)
+    started_on = db.Column(db.Integer)
+    finished_on = db.Column(db.Integer)
+    heartbeat = db.Column(db.Integer)
+
+    def to_dict(self):
+        return {"id": self.id, "state": self.state, "error": self.error,
+                "created_on": self.created_on, "started_on": self.started_on,
+                "finished_on": self.finished_on}
+
+
+# Heartbeats of the analysis workers, refreshed while they run, like the
+# heartbeat of the job they run: the app fails the jobs nobody runs anymore.
+class Worker(db.Model):
+    __tablename__="workers"
+    id = db.Column(db.String(255), primary_key=True)
+    heartbeat = db.Column(db.Integer, nullable=False)
+
+
+def upgrade_db():
+    """
+        Bring a database created by a previous version up to the models:
+        the missing tables, columns, indexes and version triggers are
+        created and the version rows seeded. Each step is skipped when it
+        is already done, so it runs on every start of the app and the pool.
+        :return: nothing.
+    """
+    db.create_all()
+    engine = db.engine
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                ddl = "ALTER TABLE {} ADD COLUMN {} {}".format(
+                    table.name, column.name, column.type.compile(engine.dialect))
+                if column.server_default is not None:
+                    ddl += " DEFAULT {}".format(column.server_default.arg)
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                connection.execute(text(ddl))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        for name in VERSIONED_TABLES:
+            connection.execute(text("INSERT OR IGNORE INTO table_versions (name, version) VALUES (:name, 0)"),
+                               {"name": name})
+            for operation in ("INSERT", "UPDATE", "DELETE"):
+                connection.execute(text(VERSION_TRIGGER.format(name, operation.lower(), operation)))